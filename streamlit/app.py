@@ -1,188 +1,55 @@
-import os
-import json
-import requests
+import time
 import streamlit as st
 import pandas as pd
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Tuple
-
-import plotly.express as px
-import plotly.graph_objects as go
-
-try:
-    import msal
-except Exception:
-    msal = None
-
-try:
-    import sqlalchemy as sa
-except Exception:
-    sa = None
+from typing import Dict, Any, Tuple, Callable
+
+from unportal.config import DEPARTMENTS, PERIODS, secret, json_secret, get_dept_config, resolve_scope, fingerprint
+from unportal.formatting import format_usd_compact, format_num_compact
+from unportal.mock import REPORT_ANCHORS, MOCK_KPIS
+from unportal.freshness import staleness_label
+from unportal.metrics import metrics, start_exporter
+from unportal.cache import result_cache, single_flight
+from unportal.charts import chart_figure, figure_cache
+from unportal.columnar import mock_catalog
+from unportal.datahub import catalog_columnar, catalog_store
+from unportal.powerbi import POWERBI_MEASURES, PBI_DEFAULT_AUTHORITY_HOST, powerbi_kpis, token_provider
+from unportal.warehouse import engine_registry, warehouse_chart_loaders
+from unportal.live import SOURCE_DEADLINES_S, fan_out
+from unportal.formulas import local_kpis
+from unportal.quality import kpi_quality
+from unportal.search import catalog_index
+from unportal.resilience import breakers
 
 st.set_page_config(page_title="UN Data Portal & Dashboard Studio", page_icon="📊", layout="wide")
 
-@dataclass
-class Dataset:
-    id: str
-    name: str
-    domain: str
-    sensitivity: str
-    certified: bool
-    owner: str
-    updateCadence: str
-    freshnessSlaHours: int
-    description: str
-    tables: List[str]
-    tags: List[str]
-    dept: str
-
-@dataclass
-class KpiDef:
-    id: str
-    name: str
-    domain: str
-    description: str
-    formula: str
-    owner: str
-    cadence: str
-    qualityChecks: List[str]
-    dept: str
-
-def _secret(key: str, default: Optional[str]=None) -> Optional[str]:
-    return st.secrets.get(key, os.getenv(key, default))
-
-def _json_secret(key: str, default=None):
-    raw = _secret(key)
-    if not raw:
-        return default
-    try:
-        return json.loads(raw)
-    except Exception:
-        return default
-
-def format_usd_compact(n: float) -> str:
-    n = float(n)
-    a = abs(n)
-    if a >= 1_000_000_000: return f"${n/1_000_000_000:.1f}B"
-    if a >= 1_000_000:     return f"${n/1_000_000:.1f}M"
-    if a >= 1_000:         return f"${n/1_000:.1f}K"
-    return f"${n:.0f}"
-
-def format_num_compact(n: float) -> str:
-    n = float(n)
-    a = abs(n)
-    if a >= 1_000_000_000: return f"{n/1_000_000_000:.1f}B"
-    if a >= 1_000_000:     return f"{n/1_000_000:.1f}M"
-    if a >= 1_000:         return f"{n/1_000:.1f}K"
-    return f"{n:.0f}"
-
-DEPARTMENTS = [
-    {"id": "central", "name": "Central (UN-wide)"},
-    {"id": "unfip", "name": "UNFIP / Funding"},
-    {"id": "advocacy", "name": "Advocacy / Comms"},
-    {"id": "partnerships", "name": "Partnerships / Ops"},
-    {"id": "gender", "name": "Gender / Women Rise"},
-]
-
 def get_scope_and_dept() -> Tuple[str, str]:
-    scope = st.session_state.get("scope_mode", "central")
-    dept = st.session_state.get("dept_id", "unfip")
-    if scope == "central":
-        return "central", "central"
-    return "department", dept
-
-def get_dept_config(scope: str, dept: str) -> Dict[str, Any]:
-    cfg = _json_secret("DEPARTMENT_CONFIG_JSON", {}) or {}
-    out = {}
-    if isinstance(cfg.get("central", {}), dict):
-        out.update(cfg.get("central", {}))
-    if scope == "department" and isinstance(cfg.get(dept, {}), dict):
-        out.update(cfg.get(dept, {}))
-    return out
-
-REPORT_ANCHORS = {
-    "unfip_disbursed_usd": 23500000,
-    "unfip_grants_usd": 12700000,
-    "unfip_entities_usd": 10800000,
-    "unfip_projects_supported": 720,
-    "unfip_countries_participating": 138,
-    "sdg_goals_lounge_in_person": 2000,
-    "sdg_goals_lounge_remote": 500000,
-    "sdg_advocates_members": 17,
-    "sdg_advocates_social_reach": 23000000,
-    "women_rise_survey_respondents": 2300,
-    "women_rise_dialogue_participants": 300,
-}
-
-MOCK_DATASETS: List[Dataset] = [
-    Dataset(
-        id="gold_unfip_funding",
-        name="UNFIP Funding & Disbursements (Gold)",
-        domain="Funding",
-        sensitivity="Internal",
-        certified=True,
-        owner="UNOP / UNFIP – Finance & Analytics",
-        updateCadence="Monthly",
-        freshnessSlaHours=168,
-        description="Curated disbursement facts and breakdowns (grants vs. UN system entities), with implementing partner and thematic tags.",
-        tables=["fact_unfip_disbursements","dim_implementing_partner","dim_theme","dim_country","dim_date"],
-        tags=["Funding","Donor","Gold","Certified"],
-        dept="unfip",
-    ),
-    Dataset(
-        id="gold_initiative_engagement",
-        name="Initiatives & Engagement Metrics (Gold)",
-        domain="Engagement",
-        sensitivity="Internal",
-        certified=True,
-        owner="UNOP – Partnerships & Comms Analytics",
-        updateCadence="Weekly",
-        freshnessSlaHours=72,
-        description="Engagement KPIs for flagship initiatives (SDG Goals Lounge, Women Rise for All, convenings) with reach and participation.",
-        tables=["fact_initiative_events","dim_initiative","dim_location","dim_date"],
-        tags=["Events","Reach","KPI","Gold"],
-        dept="central",
-    ),
-    Dataset(
-        id="gold_partnership_kpis",
-        name="Partnership KPIs (Gold)",
-        domain="Partnerships",
-        sensitivity="Internal",
-        certified=True,
-        owner="Office for Partnerships – Ops Analytics",
-        updateCadence="Daily",
-        freshnessSlaHours=24,
-        description="KPI fact table for partnership pipeline/performance: targets, achievements, engagement metrics.",
-        tables=["fact_partnership_kpis","dim_partner","dim_program","dim_date"],
-        tags=["KPI","M&E","Donor","Gold"],
-        dept="partnerships",
-    ),
-]
-
-MOCK_KPIS: List[KpiDef] = [
-    KpiDef(
-        id="kpi_unfip_total_disbursed",
-        name="UNFIP Total Disbursed (USD)",
-        domain="Funding",
-        description="Total UNFIP disbursements in the selected period.",
-        formula="SUM(disbursed_amount_usd)",
-        owner="Finance & Analytics",
-        cadence="Monthly",
-        qualityChecks=["No negative disbursements","FX normalization applied","Partner IDs valid"],
-        dept="unfip",
-    ),
-    KpiDef(
-        id="kpi_lounge_total_reach",
-        name="SDG Goals Lounge Reach",
-        domain="Engagement",
-        description="In-person participants + remote participants for SDG Goals Lounge programming.",
-        formula="SUM(in_person_attendees) + SUM(remote_viewers)",
-        owner="Partnerships & Comms Analytics",
-        cadence="Per event",
-        qualityChecks=["Event IDs unique","No null attendance values"],
-        dept="central",
-    ),
-]
+    return resolve_scope(st.session_state.get("scope_mode", "central"), st.session_state.get("dept_id", "unfip"))
+
+def catalog_page(n_items: int, page_size: int, signature: str) -> Tuple[int, int]:
+    """Current catalog page (0-based) and page count; the cursor resets when the filters change."""
+    pages = max(1, -(-n_items // page_size))
+    if st.session_state.get("catalog_sig") != signature:
+        st.session_state["catalog_sig"], st.session_state["catalog_page"] = signature, 0
+    page = min(max(int(st.session_state.get("catalog_page", 0)), 0), pages - 1)
+    st.session_state["catalog_page"] = page
+    return page, pages
+
+def move_catalog_page(step: int) -> None:
+    st.session_state["catalog_page"] = int(st.session_state.get("catalog_page", 0)) + step
+
+def render_dataset_detail(d) -> None:
+    st.write(d.description or "—")
+    st.write("**Owner:**", d.owner, " • **Sensitivity:**", d.sensitivity)
+    st.write("**Cadence:**", d.updateCadence, " • **Freshness SLA (hrs):**", d.freshnessSlaHours)
+    st.write("**Dept scope:**", d.dept)
+    if d.tags:
+        st.write("**Tags:**", ", ".join(d.tags[:40]))
+    if d.tables:
+        st.write("**Tables:**", ", ".join(d.tables))
+    b1, b2, b3 = st.columns(3)
+    b1.button("Open in catalog", key=f"open_{d.id}")
+    b2.button("Build dashboard (template)", key=f"tmpl_{d.id}")
+    b3.button("Request access", key=f"req_{d.id}")
 
 MOCK_FUNDING_BREAKDOWN = pd.DataFrame([
     {"name":"Grants","value":REPORT_ANCHORS["unfip_grants_usd"]},
@@ -203,162 +70,6 @@ MOCK_INITIATIVE_REACH = pd.DataFrame([
     {"initiative":"SDG Advocates","in_person":REPORT_ANCHORS["sdg_advocates_members"],"remote":REPORT_ANCHORS["sdg_advocates_social_reach"]},
 ])
 
-@st.cache_data(ttl=300, show_spinner=False)
-def datahub_search_datasets(query: str="*", start: int=0, count: int=50) -> List[Dataset]:
-    endpoint = _secret("DATAHUB_GQL_ENDPOINT")
-    token = _secret("DATAHUB_TOKEN")
-    if not endpoint or not token:
-        raise RuntimeError("Missing DataHub creds (DATAHUB_GQL_ENDPOINT / DATAHUB_TOKEN).")
-
-    scope, dept = get_scope_and_dept()
-    cfg = get_dept_config(scope, dept)
-    effective_query = cfg.get("DATAHUB_QUERY") or query
-
-    gql = {
-        "query": """
-        query search($input: SearchInput!) {
-          search(input: $input) {
-            searchResults {
-              entity {
-                urn
-                ... on Dataset {
-                  properties { name description }
-                  domain { properties { name } }
-                  tags { tags { tag { properties { name } } } }
-                }
-              }
-            }
-          }
-        }""",
-        "variables": {"input": {"type":"DATASET","query": effective_query, "start": start, "count": count}},
-    }
-
-    r = requests.post(endpoint, headers={"Authorization": f"Bearer {token}", "Content-Type":"application/json"}, data=json.dumps(gql), timeout=30)
-    if r.status_code >= 300:
-        raise RuntimeError(f"DataHub search failed: {r.status_code} {r.text[:500]}")
-    data = r.json()
-    results = data.get("data", {}).get("search", {}).get("searchResults", [])
-
-    out: List[Dataset] = []
-    for item in results:
-        ds = item.get("entity", {}) or {}
-        props = ds.get("properties", {}) or {}
-        domain = (ds.get("domain", {}) or {}).get("properties", {}).get("name", "Unknown")
-        tags = [(((t or {}).get("tag", {}) or {}).get("properties", {}) or {}).get("name")
-                for t in ((ds.get("tags", {}) or {}).get("tags", []) or [])]
-        tags = [t for t in tags if t]
-        out.append(Dataset(
-            id=ds.get("urn", props.get("name","dataset")),
-            name=props.get("name") or ds.get("urn") or "Dataset",
-            domain=domain,
-            sensitivity="Internal",
-            certified=True,
-            owner="Unassigned",
-            updateCadence="Unknown",
-            freshnessSlaHours=168,
-            description=props.get("description") or "",
-            tables=[],
-            tags=tags,
-            dept=(dept if scope=="department" else "central"),
-        ))
-    return out
-
-def _powerbi_access_token() -> str:
-    tenant = _secret("PBI_TENANT_ID")
-    client_id = _secret("PBI_CLIENT_ID")
-    client_secret = _secret("PBI_CLIENT_SECRET")
-    if not tenant or not client_id or not client_secret:
-        raise RuntimeError("Missing Power BI creds (PBI_TENANT_ID / PBI_CLIENT_ID / PBI_CLIENT_SECRET).")
-    if msal is None:
-        raise RuntimeError("Missing dependency: msal")
-    authority = f"https://login.microsoftonline.com/{tenant}"
-    app = msal.ConfidentialClientApplication(client_id, authority=authority, client_credential=client_secret)
-    scopes = ["https://analysis.windows.net/powerbi/api/.default"]
-    res = app.acquire_token_for_client(scopes=scopes)
-    if "access_token" not in res:
-        raise RuntimeError(f"Token failure: {res.get('error_description', str(res))}")
-    return res["access_token"]
-
-def _powerbi_execute_dax(group_id: str, dataset_id: str, dax: str) -> Dict[str, Any]:
-    token = _powerbi_access_token()
-    url = f"https://api.powerbi.com/v1.0/myorg/groups/{group_id}/datasets/{dataset_id}/executeQueries"
-    body = {"queries":[{"query": dax}], "serializerSettings":{"includeNulls": True}}
-    r = requests.post(url, headers={"Authorization": f"Bearer {token}", "Content-Type":"application/json"}, data=json.dumps(body), timeout=30)
-    if r.status_code >= 300:
-        raise RuntimeError(f"executeQueries failed: {r.status_code} {r.text[:500]}")
-    return r.json()
-
-def _extract_row_number(exec_res: Dict[str, Any], col: str) -> float:
-    row = (((exec_res.get("results") or [{}])[0].get("tables") or [{}])[0].get("rows") or [{}])[0]
-    try:
-        return float(row.get(col, 0) or 0)
-    except Exception:
-        return 0.0
-
-@st.cache_data(ttl=300, show_spinner=False)
-def powerbi_kpis(period: str) -> Dict[str, float]:
-    scope, dept = get_scope_and_dept()
-    cfg = get_dept_config(scope, dept)
-    group_id = cfg.get("PBI_GROUP_ID") or _secret("PBI_GROUP_ID")
-    dataset_id = cfg.get("PBI_DATASET_ID") or _secret("PBI_DATASET_ID")
-    if not group_id or not dataset_id:
-        raise RuntimeError("Missing Power BI IDs (PBI_GROUP_ID / PBI_DATASET_ID).")
-
-    # Replace these with your exact Power BI measure names
-    dax_total = 'EVALUATE ROW("totalDisbursedUsd", [Total Disbursed USD])'
-    dax_projects = 'EVALUATE ROW("projectsSupported", [Projects Supported])'
-    dax_countries = 'EVALUATE ROW("countriesParticipating", [Countries Participating])'
-    dax_in = 'EVALUATE ROW("loungeInPerson", [SDG Lounge In-Person])'
-    dax_remote = 'EVALUATE ROW("loungeRemote", [SDG Lounge Remote])'
-    dax_adv_reach = 'EVALUATE ROW("advocatesSocialReach", [SDG Advocates Social Reach])'
-
-    r1 = _powerbi_execute_dax(group_id, dataset_id, dax_total)
-    r2 = _powerbi_execute_dax(group_id, dataset_id, dax_projects)
-    r3 = _powerbi_execute_dax(group_id, dataset_id, dax_countries)
-    r4 = _powerbi_execute_dax(group_id, dataset_id, dax_in)
-    r5 = _powerbi_execute_dax(group_id, dataset_id, dax_remote)
-    r6 = _powerbi_execute_dax(group_id, dataset_id, dax_adv_reach)
-
-    return {
-        "totalDisbursedUsd": _extract_row_number(r1, "totalDisbursedUsd"),
-        "projectsSupported": _extract_row_number(r2, "projectsSupported"),
-        "countriesParticipating": _extract_row_number(r3, "countriesParticipating"),
-        "loungeInPerson": _extract_row_number(r4, "loungeInPerson"),
-        "loungeRemote": _extract_row_number(r5, "loungeRemote"),
-        "advocatesSocialReach": _extract_row_number(r6, "advocatesSocialReach"),
-    }
-
-def _warehouse_engine(dsn: str):
-    if sa is None:
-        raise RuntimeError("Missing dependency: SQLAlchemy")
-    return sa.create_engine(dsn, pool_pre_ping=True)
-
-@st.cache_data(ttl=300, show_spinner=False)
-def warehouse_query(sql: str, params: Dict[str, Any], dsn: str) -> pd.DataFrame:
-    eng = _warehouse_engine(dsn)
-    with eng.connect() as conn:
-        return pd.read_sql(sa.text(sql), conn, params=params)
-
-def load_charts_from_warehouse(period: str):
-    scope, dept = get_scope_and_dept()
-    cfg = get_dept_config(scope, dept)
-
-    dsn = cfg.get("WAREHOUSE_DSN") or _secret("WAREHOUSE_DSN")
-    if not dsn:
-        raise RuntimeError("Missing WAREHOUSE_DSN.")
-
-    sql_breakdown = cfg.get("SQL_FUNDING_BREAKDOWN") or _secret("SQL_FUNDING_BREAKDOWN", "")
-    sql_trend = cfg.get("SQL_UNFIP_TREND") or _secret("SQL_UNFIP_TREND", "")
-    sql_reach = cfg.get("SQL_INITIATIVE_REACH") or _secret("SQL_INITIATIVE_REACH", "")
-    if not (sql_breakdown and sql_trend and sql_reach):
-        raise RuntimeError("Missing SQL templates.")
-
-    year = 2024 if period != "y2025" else 2025
-    breakdown = warehouse_query(sql_breakdown, {"year": year}, dsn)
-    trend = warehouse_query(sql_trend, {"year": year}, dsn)
-    reach = warehouse_query(sql_reach, {"year": year}, dsn)
-    return breakdown, trend, reach
-
 # Sidebar
 st.sidebar.title("Portal Controls")
 scope_mode = st.sidebar.selectbox("Operating mode", ["central","department"], index=0, help="Central = UN-wide, Department = scoped assets + workspace")
@@ -373,46 +84,68 @@ dept_id = dept_ids[dept_labels.index(dept_pick)] if scope_mode == "department" e
 st.session_state["dept_id"] = dept_id
 
 run_mode = st.sidebar.selectbox("Run mode", ["Mock (offline)", "Live (DataHub + Power BI + Warehouse)"], index=0)
-period = st.sidebar.selectbox("Period", ["y2024","y2025","last_30d","last_6m"], index=0)
+period = st.sidebar.selectbox("Period", PERIODS, index=0)
+
+scope, dept = get_scope_and_dept()
+metrics().tags.set({"dept": dept, "period": period})
+if secret("METRICS_PORT"):
+    start_exporter(int(secret("METRICS_PORT")))
 
 if st.sidebar.button("Refresh / Re-run"):
-    st.cache_data.clear()
+    # Only this department's cached results and catalog slices; other users' departments stay warm
+    result_cache().invalidate(dept=dept)
+    catalog_store().invalidate(dept)
     st.rerun()
 
 # Defaults
-datasets = MOCK_DATASETS
+datasets = mock_catalog()
 kpis = MOCK_KPIS
-kpi_vals = {
-    "totalDisbursedUsd": REPORT_ANCHORS["unfip_disbursed_usd"],
-    "projectsSupported": REPORT_ANCHORS["unfip_projects_supported"],
-    "countriesParticipating": REPORT_ANCHORS["unfip_countries_participating"],
-    "loungeInPerson": REPORT_ANCHORS["sdg_goals_lounge_in_person"],
-    "loungeRemote": REPORT_ANCHORS["sdg_goals_lounge_remote"],
-    "advocatesSocialReach": REPORT_ANCHORS["sdg_advocates_social_reach"],
-}
+kpi_vals = {m.key: m.mock for m in POWERBI_MEASURES}
+kpi_fetched_at: Dict[str, float] = {}
+kpi_source = "mock"
+kpi_checks: Dict[str, Any] = {}
 funding_breakdown = MOCK_FUNDING_BREAKDOWN.copy()
 trend = MOCK_UNFIP_TREND.copy()
 initiative_reach = MOCK_INITIATIVE_REACH.copy()
 
 errors = []
 if run_mode.startswith("Live"):
+    tasks: Dict[str, Callable[[], Any]] = {
+        "DataHub": lambda: catalog_columnar(scope, dept, "*"),
+        "Power BI": lambda: powerbi_kpis(period, scope, dept),
+        "KPI engine": lambda: local_kpis(period, scope, dept),  # local fallback for Power BI
+        "Quality": lambda: kpi_quality(kpis, scope, dept),
+    }
     try:
-        datasets = datahub_search_datasets("*", 0, 50)
-    except Exception as e:
-        errors.append(f"DataHub: {e}")
-    try:
-        kpi_vals.update(powerbi_kpis(period))
-    except Exception as e:
-        errors.append(f"Power BI: {e}")
-    try:
-        funding_breakdown, trend, initiative_reach = load_charts_from_warehouse(period)
+        tasks.update({f"Warehouse/{name}": fn for name, fn in warehouse_chart_loaders(period, scope, dept).items()})
     except Exception as e:
         errors.append(f"Warehouse: {e}")
+    deadlines = dict(SOURCE_DEADLINES_S)
+    deadlines.update(json_secret("LIVE_SOURCE_DEADLINES_JSON", {}) or {})
+    results, failures, timings = fan_out(
+        tasks, deadlines,
+        page_deadline_s=float(secret("LIVE_PAGE_DEADLINE_S", "30")),
+        max_workers=int(secret("LIVE_MAX_WORKERS", "8")),
+    )
+    st.session_state["live_source_timings"] = timings
+    datasets = results.get("DataHub", datasets)
+    if "Power BI" in results:
+        failures.pop("KPI engine", None)
+    for name in ("Power BI", "KPI engine"):
+        if name in results:
+            kpi_vals.update(results[name][0])
+            kpi_fetched_at.update(results[name][1])
+            kpi_source = name
+            break
+    funding_breakdown = results.get("Warehouse/breakdown", funding_breakdown)
+    trend = results.get("Warehouse/trend", trend)
+    initiative_reach = results.get("Warehouse/reach", initiative_reach)
+    kpi_checks = results.get("Quality", kpi_checks)
+    errors.extend(f"{name}: {msg}" for name, msg in failures.items())
 
 # Scope filter (mock)
 if run_mode.startswith("Mock"):
     if scope_mode == "department":
-        datasets = [d for d in datasets if d.dept in (dept_id, "central")]
         kpis = [k for k in kpis if k.dept in (dept_id, "central")]
 
 # Main
@@ -433,51 +166,81 @@ with tab_dashboard:
     c2.metric("Projects Supported", format_num_compact(kpi_vals["projectsSupported"]))
     c3.metric("SDG Goals Lounge Reach", format_num_compact(lounge_total))
     c4.metric("SDG Advocates Reach", format_num_compact(kpi_vals["advocatesSocialReach"]))
+    if kpi_fetched_at:
+        measure_ds = {m.key: m.dataset for m in POWERBI_MEASURES}
+        for col, keys in ((c1, ["totalDisbursedUsd"]), (c2, ["projectsSupported"]),
+                          (c3, ["loungeInPerson", "loungeRemote"]), (c4, ["advocatesSocialReach"])):
+            fetched = [kpi_fetched_at[k] for k in keys if k in kpi_fetched_at]
+            if fetched:
+                col.caption(staleness_label(min(fetched), measure_ds[keys[0]]))
+    if kpi_source == "KPI engine":
+        st.caption("KPIs computed locally from warehouse facts (Power BI unavailable).")
 
     st.markdown("### Disbursements Trend (USD M)")
-    fig = px.line(trend, x="x", y="disbursed_m", markers=True)
-    st.plotly_chart(fig, use_container_width=True)
+    with metrics().timed("chart_render", chart="trend"):
+        st.plotly_chart(chart_figure("line", trend, x="x", y="disbursed_m", markers=True), use_container_width=True)
 
     st.markdown("### Funding Breakdown")
-    fig = px.pie(funding_breakdown, names="name", values="value", hole=0.35)
-    st.plotly_chart(fig, use_container_width=True)
+    with metrics().timed("chart_render", chart="breakdown"):
+        st.plotly_chart(chart_figure("pie", funding_breakdown, names="name", values="value", hole=0.35),
+                        use_container_width=True)
 
     st.markdown("### Initiative Reach Snapshot")
-    fig = go.Figure()
-    fig.add_trace(go.Bar(x=initiative_reach["initiative"], y=initiative_reach["in_person"], name="In-person"))
-    fig.add_trace(go.Bar(x=initiative_reach["initiative"], y=initiative_reach["remote"], name="Remote / Digital"))
-    fig.update_layout(barmode="group")
-    st.plotly_chart(fig, use_container_width=True)
+    with metrics().timed("chart_render", chart="reach"):
+        fig = chart_figure("grouped_bar", initiative_reach, x="initiative",
+                           bars=[("in_person", "In-person"), ("remote", "Remote / Digital")])
+        st.plotly_chart(fig, use_container_width=True)
 
 with tab_catalog:
     st.markdown("### Dataset Catalog")
     q = st.text_input("Search datasets", value="")
-    domains = sorted(list({d.domain for d in datasets})) if datasets else []
-    domain = st.selectbox("Domain", ["All domains"] + domains, index=0)
-
-    def keep(d: Dataset) -> bool:
-        ok_domain = (domain == "All domains") or (d.domain == domain)
-        if not q.strip():
-            return ok_domain
-        hay = f"{d.name} {d.domain} {d.description} {' '.join(d.tags)}".lower()
-        return ok_domain and (q.strip().lower() in hay)
-
-    filtered = [d for d in datasets if keep(d)]
-    st.caption(f"Showing {len(filtered)} dataset(s)")
-    for d in filtered:
-        with st.expander(f"{'✅' if d.certified else '🟡'} {d.name} — {d.domain}", expanded=False):
-            st.write(d.description or "—")
-            st.write("**Owner:**", d.owner, " • **Sensitivity:**", d.sensitivity)
-            st.write("**Cadence:**", d.updateCadence, " • **Freshness SLA (hrs):**", d.freshnessSlaHours)
-            st.write("**Dept scope:**", d.dept)
-            if d.tags:
-                st.write("**Tags:**", ", ".join(d.tags[:40]))
-            if d.tables:
-                st.write("**Tables:**", ", ".join(d.tables))
-            b1, b2, b3 = st.columns(3)
-            b1.button("Open in catalog", key=f"open_{d.id}")
-            b2.button("Build dashboard (template)", key=f"tmpl_{d.id}")
-            b3.button("Request access", key=f"req_{d.id}")
+    index = catalog_index(f"{run_mode}|{scope_mode}|{dept_id}")
+    index.sync(datasets)
+    scope_depts = (dept_id, "central") if scope_mode == "department" else None
+    f1, f2 = st.columns([3, 1])
+    domain = f1.selectbox("Domain", ["All domains"] + index.facet_values("domain", scope_depts), index=0)
+    certified_only = f2.checkbox("Certified only", value=False)
+    filtered = index.search(
+        q,
+        domain=None if domain == "All domains" else domain,
+        depts=scope_depts,
+        certified=True if certified_only else None,
+    )
+    v1, v2 = st.columns([3, 1])
+    view = v1.radio("View", ["Table", "Cards"], horizontal=True, label_visibility="collapsed")
+    sizes = sorted({10, 25, 50, 100, int(secret("CATALOG_PAGE_SIZE", "25"))})
+    page_size = v2.selectbox("Per page", sizes, index=sizes.index(int(secret("CATALOG_PAGE_SIZE", "25"))))
+    page_sig = f"{run_mode}|{scope_mode}|{dept_id}|{q}|{domain}|{certified_only}|{page_size}"
+    page, pages = catalog_page(len(filtered), page_size, page_sig)
+    page_items = filtered[page * page_size:(page + 1) * page_size]
+
+    n1, n2, n3 = st.columns([1, 4, 1])
+    n1.button("◀ Prev", on_click=move_catalog_page, args=(-1,), disabled=page == 0)
+    n2.caption(f"Showing {page * page_size + 1 if page_items else 0}–{page * page_size + len(page_items)} "
+               f"of {len(filtered)} dataset(s) • page {page + 1} of {pages}")
+    n3.button("Next ▶", on_click=move_catalog_page, args=(1,), disabled=page >= pages - 1)
+
+    if view == "Table":
+        # One dataframe per page and filter set (a kept selection would point at another dataset);
+        # only the selected row's detail panel is built
+        table = pd.DataFrame([{
+            "": "✅" if d.certified else "🟡", "name": d.name, "domain": d.domain, "owner": d.owner,
+            "sensitivity": d.sensitivity, "cadence": d.updateCadence, "SLA (h)": d.freshnessSlaHours,
+            "dept": d.dept, "tags": ", ".join(d.tags[:8]),
+        } for d in page_items])
+        event = st.dataframe(table, use_container_width=True, hide_index=True, on_select="rerun",
+                             selection_mode="single-row", key=f"catalog_table_{fingerprint(page_sig)}_{page}")
+        selected = event.selection.rows if event is not None else []
+        if selected and selected[0] < len(page_items):
+            d = page_items[selected[0]]
+            st.markdown(f"#### {'✅' if d.certified else '🟡'} {d.name} — {d.domain}")
+            render_dataset_detail(d)
+        elif page_items:
+            st.caption("Select a row to see its details.")
+    else:
+        for d in page_items:
+            with st.expander(f"{'✅' if d.certified else '🟡'} {d.name} — {d.domain}", expanded=False):
+                render_dataset_detail(d)
 
 with tab_kpis:
     st.markdown("### KPI Dictionary")
@@ -485,7 +248,20 @@ with tab_kpis:
     if df.empty:
         st.info("No KPI dictionary loaded.")
     else:
-        st.dataframe(df[["name","domain","description","formula","owner","cadence","dept"]], use_container_width=True, hide_index=True)
+        status_icon = {"pass": "✅", "fail": "❌", "error": "⚠️", "manual": "➖"}
+        df["quality"] = [
+            " ".join(status_icon[r.status] for r in kpi_checks[k.id]) if k.id in kpi_checks else "; ".join(k.qualityChecks)
+            for k in kpis
+        ]
+        st.dataframe(df[["name","domain","description","formula","owner","cadence","dept","quality"]], use_container_width=True, hide_index=True)
+        for k in kpis:
+            if k.id in kpi_checks:
+                with st.expander(f"Quality checks · {k.name}"):
+                    st.dataframe(pd.DataFrame([
+                        {"": status_icon[r.status], "rule": r.rule, "check": r.check, "rows": r.rows,
+                         "failing rows": r.failures, "ms": round(r.elapsed_ms, 1), "detail": r.detail}
+                        for r in kpi_checks[k.id]
+                    ]), use_container_width=True, hide_index=True)
 
 with tab_gallery:
     st.markdown("### Dashboard Gallery (starter)")
@@ -535,3 +311,85 @@ with tab_integrations:
         "- Departments build dashboards in their own workspaces while using the same trusted metrics.\n"
         "- The portal becomes the launchpad: discover data products → pick template → create dashboard → publish.\n"
     )
+    st.markdown("#### Live connection diagnostics")
+    tok_stats = token_provider(secret("PBI_AUTHORITY_HOST", PBI_DEFAULT_AUTHORITY_HOST)).stats()
+    st.caption(
+        f"Power BI tokens: hit rate **{tok_stats['hit_rate']:.0%}** "
+        f"({tok_stats['hits']} hits / {tok_stats['misses']} misses) • "
+        f"AAD acquisitions: {tok_stats['acquisitions']} (avg {tok_stats['acquire_ms_avg']:.0f} ms, "
+        f"max {tok_stats['acquire_ms_max']:.0f} ms) • background refreshes: {tok_stats['background_refreshes']}"
+    )
+    timings = st.session_state.get("live_source_timings") or {}
+    if timings:
+        st.caption("Last live load: " + " • ".join(f"{k} {v:.2f}s" for k, v in sorted(timings.items())))
+    if run_mode.startswith("Live"):
+        try:
+            query_now = get_dept_config(scope, dept).get("DATAHUB_QUERY") or "*"
+            sync_state = catalog_store().state(f"{dept}|{query_now}") or {}
+            if sync_state.get("last_sync"):
+                st.caption(f"Catalog store: {sync_state.get('total') or 0} datasets • last sync "
+                           f"{time.time() - sync_state['last_sync']:.0f}s ago"
+                           + (f" • last error: {sync_state['last_error']}" if sync_state.get("last_error") else ""))
+        except Exception:
+            pass
+    cache_stats = result_cache().stats()
+    st.caption(f"Result cache: hit rate **{cache_stats['hit_rate']:.0%}** ({cache_stats['memory_hits']} memory / "
+               f"{cache_stats['disk_hits']} disk hits, {cache_stats['misses']} misses) • "
+               f"{cache_stats['memory_entries']} entries, {cache_stats['memory_mb']:.1f} MB in memory • "
+               f"{cache_stats['last_good_served']} last-known-good fallbacks")
+    flight_stats = single_flight().stats()
+    st.caption(f"Single-flight: **{flight_stats['merged']}** concurrent requests merged into "
+               f"{flight_stats['calls']} upstream calls ({flight_stats['in_flight']} in flight)")
+    fig_stats = figure_cache().stats()
+    st.caption(f"Figure cache: {fig_stats['hits']} hits / {fig_stats['misses']} builds • {fig_stats['entries']} figures")
+    inv1, inv2, inv3 = st.columns(3)
+    for col, (source, label) in zip((inv1, inv2, inv3), (("datahub", "DataHub"), ("powerbi", "Power BI"), ("warehouse", "Warehouse"))):
+        if col.button(f"Invalidate {label} ({dept})", key=f"invalidate_{source}"):
+            if source == "datahub":  # the catalog is served from the local store, not the result cache
+                catalog_store().invalidate(dept)
+            else:
+                result_cache().invalidate(source=source, dept=dept)
+            st.rerun()
+    pool_stats = engine_registry().stats()
+    if pool_stats:
+        st.caption("Warehouse connection pools")
+        st.dataframe(pd.DataFrame(pool_stats), use_container_width=True, hide_index=True)
+    breaker_stats = breakers().stats()
+    if breaker_stats:
+        st.caption("Circuit breakers (adaptive timeouts from observed p99)")
+        st.dataframe(pd.DataFrame(breaker_stats)[["kind", "endpoint", "state", "consecutive_failures", "calls",
+                                                   "failures", "slow", "retries", "rejected", "opens",
+                                                   "p50_s", "p99_s", "timeout_s"]],
+                     use_container_width=True, hide_index=True)
+
+    st.markdown("#### Source metrics")
+    registry = metrics()
+    latency = pd.DataFrame(registry.histograms("latency_seconds"))
+    if latency.empty:
+        st.caption("No calls recorded in this process yet.")
+    else:
+        by = [c for c in ("op", "source", "chart", "dept", "period") if c in latency.columns]
+        latency = latency.fillna({c: "" for c in by})
+        err = pd.DataFrame(registry.counters("errors_total"))
+        if not err.empty:
+            err = err.fillna({c: "" for c in by}).reindex(columns=by + ["value"], fill_value="")
+            latency = latency.merge(err.groupby(by, as_index=False)["value"].sum().rename(columns={"value": "errors"}),
+                                    on=by, how="left")
+        payload = pd.DataFrame(registry.histograms("payload_bytes"))
+        if not payload.empty:
+            payload = payload.fillna({c: "" for c in by}).reindex(columns=by + ["mean"], fill_value="")
+            latency = latency.merge(payload.rename(columns={"mean": "payload_kb"}), on=by, how="left")
+            latency["payload_kb"] = latency["payload_kb"] / 1e3
+        for col in ("mean", "p50", "p95"):
+            latency[f"{col}_ms"] = latency[col] * 1000
+        cols = by + ["count", "errors", "mean_ms", "p50_ms", "p95_ms", "payload_kb"]
+        st.dataframe(latency.reindex(columns=cols).sort_values(by).round(1), use_container_width=True, hide_index=True)
+    cache_rows = pd.DataFrame(registry.counters("cache_requests_total"))
+    if not cache_rows.empty:
+        cache_rows = cache_rows.fillna({"source": ""})
+        pivot = cache_rows.pivot_table(index=["cache", "source"], columns="result", values="value",
+                                       aggfunc="sum", fill_value=0).reset_index()
+        st.caption("Cache lookups by source")
+        st.dataframe(pivot, use_container_width=True, hide_index=True)
+    st.download_button("Download metrics (Prometheus text)", registry.prometheus_text(),
+                       file_name="unportal_metrics.prom", mime="text/plain")
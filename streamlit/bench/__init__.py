@@ -0,0 +1 @@
+"""Offline benchmark harness for the portal: local DataHub / Power BI stand-ins and a synthetic warehouse."""
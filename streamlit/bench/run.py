@@ -0,0 +1,216 @@
+"""End-to-end page-build benchmark against local stand-ins.
+
+Runs `app.py` headlessly (Streamlit AppTest) for each run mode x department x warehouse
+scale, measuring cold (fresh process, empty caches) and warm (immediate rerun) page
+builds, the per-source times the live fan-out records, and peak RSS. Each scenario runs
+in its own subprocess so caches and memory never leak between scenarios. The cold import
+time of the headless `unportal` package is measured the same way, along with which heavy
+dependencies the import pulled in. Results are compared with `baseline.json`; a slowdown
+beyond the tolerance (or a newly eager heavy import) exits non-zero.
+
+    python -m bench.run                                  # from the streamlit/ folder
+    python -m bench.run --scales 1e3 1e5 1e7 --pbi-latency-ms 150 --failure-rate 0.05
+    python -m bench.run --update-baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(os.path.dirname(HERE), "app.py")
+BASELINE = os.path.join(HERE, "baseline.json")
+DEPARTMENTS = ["central", "unfip", "advocacy", "partnerships", "gender"]
+MODES = {"mock": "Mock (offline)", "live": "Live (DataHub + Power BI + Warehouse)"}
+IMPORT_TARGETS = ["unportal", "unportal.api"]
+HEAVY_MODULES = ["streamlit", "pandas", "plotly", "msal", "sqlalchemy", "pyarrow"]
+
+def _secrets(dsn: str, datahub_url: str, pbi_url: str, cache_dir: str, rollups: bool) -> Dict[str, Any]:
+    from bench.warehouse import SQL_TEMPLATES
+
+    secrets = {
+        "DATAHUB_GQL_ENDPOINT": datahub_url, "DATAHUB_TOKEN": "bench",
+        "PBI_TENANT_ID": "bench-tenant", "PBI_CLIENT_ID": "bench-client", "PBI_CLIENT_SECRET": "bench-secret",
+        "PBI_GROUP_ID": "bench-group", "PBI_DATASET_ID": "bench-dataset",
+        "PBI_AUTHORITY_HOST": pbi_url, "PBI_API_BASE": pbi_url,
+        "WAREHOUSE_DSN": dsn, "WAREHOUSE_ROLLUPS": "1" if rollups else "",
+        "CATALOG_DB_PATH": os.path.join(cache_dir, "catalog.sqlite"),
+        "RESULT_CACHE_PATH": os.path.join(cache_dir, "results.sqlite"),
+        "WAREHOUSE_CACHE_DIR": os.path.join(cache_dir, "warehouse"),
+        "ROLLUP_DB_PATH": os.path.join(cache_dir, "rollups.sqlite"),
+    }
+    secrets.update(SQL_TEMPLATES)
+    return secrets
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1e6 if sys.platform == "darwin" else peak / 1e3, 1)
+
+def _timed_run(at: Any) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    at.run()
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    timings = at.session_state["live_source_timings"] if "live_source_timings" in at.session_state else {}
+    return {
+        "ms": round(elapsed_ms, 1),
+        "peak_rss_mb": _peak_rss_mb(),
+        "sources_ms": {k: round(v * 1000, 1) for k, v in sorted(timings.items())},
+        "errors": [w.value for w in at.warning] + [str(e.value) for e in at.exception],
+    }
+
+def run_scenario(mode: str, dept: str, period: str, secrets: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+    """One cold and one warm page build; meant to run in a fresh process (see `--child`)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout_s)
+    for k, v in secrets.items():
+        at.secrets[k] = v
+    at.run()  # first pass only materializes the sidebar widgets (mock, central)
+    if dept != "central":
+        at.sidebar.selectbox[0].set_value("department").run()  # the department picker is disabled until then
+        at.sidebar.selectbox[1].set_value(at.sidebar.selectbox[1].options[DEPARTMENTS.index(dept) - 1])
+    at.sidebar.selectbox[2].set_value(MODES[mode])
+    at.sidebar.selectbox[3].set_value(period)
+    cold = _timed_run(at)
+    warm = _timed_run(at)
+    return {"cold": cold, "warm": warm}
+
+def measure_import(module: str, repeat: int = 5) -> Dict[str, Any]:
+    """Best-of-`repeat` cold import of `module`, each in a fresh interpreter."""
+    code = (f"import json, sys, time; t0 = time.perf_counter(); import {module}; "
+            f"ms = (time.perf_counter() - t0) * 1000; "
+            f"print(json.dumps([ms, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))")
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              cwd=os.path.dirname(HERE), check=True)
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    ms, heavy = min(runs)
+    return {"import": {"ms": round(ms, 1), "heavy_modules": heavy}}
+
+def _run_child(spec: Dict[str, Any]) -> Dict[str, Any]:
+    proc = subprocess.run([sys.executable, "-m", "bench.run", "--child"], input=json.dumps(spec),
+                          capture_output=True, text=True, cwd=os.path.dirname(HERE), timeout=spec["timeout_s"] * 3)
+    if proc.returncode != 0:
+        raise RuntimeError(f"scenario failed: {proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+            slack_ms: float = 25.0, slack_mb: float = 10.0) -> List[str]:
+    """Scenario metrics that got worse than baseline * (1 + tolerance) plus a small absolute slack."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for phase in ("cold", "warm", "import"):
+            if phase not in base or phase not in res:
+                continue
+            for metric, slack in (("ms", slack_ms), ("peak_rss_mb", slack_mb)):
+                if metric not in base[phase]:
+                    continue
+                was, now = base[phase][metric], res[phase][metric]
+                if now > was * (1 + tolerance) + slack:
+                    regressions.append(f"{name} {phase} {metric}: {was} -> {now}")
+            new_heavy = set(res[phase].get("heavy_modules", [])) - set(base[phase].get("heavy_modules", []))
+            if new_heavy:
+                regressions.append(f"{name} now imports {', '.join(sorted(new_heavy))} eagerly")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--scales", nargs="+", default=["1e3", "1e4", "1e5"], help="fact rows per warehouse (1e3 .. 1e7)")
+    p.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    p.add_argument("--departments", nargs="+", default=DEPARTMENTS, choices=DEPARTMENTS)
+    p.add_argument("--period", default="y2024")
+    p.add_argument("--rollups", action="store_true", help="answer charts from local rollups instead of SQL templates")
+    p.add_argument("--catalog-size", type=int, default=1000, help="datasets served by the DataHub stub")
+    p.add_argument("--datahub-latency-ms", type=float, default=20.0)
+    p.add_argument("--pbi-latency-ms", type=float, default=50.0)
+    p.add_argument("--jitter-ms", type=float, default=10.0)
+    p.add_argument("--failure-rate", type=float, default=0.0)
+    p.add_argument("--timeout-s", type=float, default=300.0)
+    p.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "un-portal-bench"))
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("--update-baseline", action="store_true")
+    p.add_argument("--imports", nargs="*", default=IMPORT_TARGETS, help="modules whose cold import time to measure")
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown vs. baseline")
+    p.add_argument("--out", help="write the full results as JSON")
+    p.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.child:
+        spec = json.load(sys.stdin)
+        print(json.dumps(run_scenario(spec["mode"], spec["dept"], spec["period"], spec["secrets"], spec["timeout_s"])))
+        return 0
+
+    sys.path.insert(0, os.path.dirname(HERE))
+    from bench.stubs import Faults, make_self_signed_cert, start_datahub, start_powerbi
+    from bench.warehouse import build_warehouse
+
+    os.makedirs(args.workdir, exist_ok=True)
+    cert_file, key_file = make_self_signed_cert(args.workdir)
+    os.environ["REQUESTS_CA_BUNDLE"] = cert_file
+    datahub = start_datahub(cert_file, key_file, Faults(args.datahub_latency_ms, args.jitter_ms, args.failure_rate, 1),
+                            catalog_size=args.catalog_size)
+    powerbi = start_powerbi(cert_file, key_file, Faults(args.pbi_latency_ms, args.jitter_ms, args.failure_rate, 2))
+
+    results: Dict[str, Any] = {}
+    for module in args.imports:
+        res = measure_import(module)
+        results[f"import/{module}"] = res
+        print(f"{'import/' + module:32s} {res['import']['ms']:8.1f} ms  heavy: {', '.join(res['import']['heavy_modules']) or '-'}")
+    try:
+        for i, scale in enumerate(args.scales):
+            rows = int(float(scale))
+            t0 = time.perf_counter()
+            dsn = build_warehouse(os.path.join(args.workdir, f"warehouse_{rows}.sqlite"), rows)
+            print(f"# warehouse {rows:,} rows ready in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+            for mode in args.modes:
+                if mode == "mock" and i:
+                    continue  # mock mode never touches the warehouse; measure it once
+                for dept in args.departments:
+                    name = f"{mode}/{dept}" + ("" if mode == "mock" else f"/{rows:.0e}")
+                    cache_dir = tempfile.mkdtemp(prefix="cache-", dir=args.workdir)
+                    secrets = _secrets(dsn, f"{datahub.url}/api/graphql", powerbi.url, cache_dir, args.rollups)
+                    res = _run_child({"mode": mode, "dept": dept, "period": args.period, "secrets": secrets,
+                                      "timeout_s": args.timeout_s})
+                    results[name] = res
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                    srcs = " ".join(f"{k}={v:.0f}" for k, v in res["cold"]["sources_ms"].items())
+                    print(f"{name:32s} cold {res['cold']['ms']:8.1f} ms  warm {res['warm']['ms']:8.1f} ms  "
+                          f"rss {res['warm']['peak_rss_mb']:7.1f} MB  {srcs}"
+                          + (f"  errors={len(res['cold']['errors'])}" if res["cold"]["errors"] else ""))
+    finally:
+        datahub.stop()
+        powerbi.stop()
+
+    print(f"# stub calls: datahub={datahub.calls} powerbi={powerbi.calls}", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"# baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
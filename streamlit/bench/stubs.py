@@ -0,0 +1,213 @@
+"""Local stand-ins for the DataHub GraphQL API and the Power BI / AAD endpoints.
+
+Both servers speak HTTPS with a throwaway self-signed certificate (MSAL refuses plain
+http authorities); point `REQUESTS_CA_BUNDLE` at `cert_file` so `requests` and MSAL trust it.
+Latency and failures are injected per request through `Faults`.
+"""
+import datetime
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+def make_self_signed_cert(directory: str) -> Tuple[str, str]:
+    """Write a localhost/127.0.0.1 certificate and key into `directory`; returns (cert_file, key_file)."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_file, key_file = os.path.join(directory, "stub-cert.pem"), os.path.join(directory, "stub-key.pem")
+    with open(cert_file, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_file, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+    return cert_file, key_file
+
+class Faults:
+    """Per-request latency (base + uniform jitter) and failure injection."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency_ms, self.jitter_ms, self.failure_rate = latency_ms, jitter_ms, failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self) -> bool:
+        """Sleep for the injected latency; True if this request should fail."""
+        with self._lock:
+            delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+            fail = self._rng.random() < self.failure_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return fail
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _count(self, name: str) -> None:
+        with self.server.lock:
+            self.server.calls[name] = self.server.calls.get(name, 0) + 1
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded HTTPS server on 127.0.0.1 with an ephemeral port."""
+
+    daemon_threads = True
+
+    def __init__(self, handler: type, cert_file: str, key_file: str, faults: Faults, **options: Any):
+        super().__init__(("127.0.0.1", 0), handler)
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert_file, key_file)
+        self.socket = ctx.wrap_socket(self.socket, server_side=True)
+        self.faults = faults
+        self.options = options
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"https://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name="bench-stub")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+DOMAINS = ["Funding", "Engagement", "Partnerships", "Advocacy", "Gender"]
+TAGS = ["Gold", "Certified", "KPI", "Donor", "Events", "Reach", "M&E", "dept:unfip", "dept:advocacy"]
+
+def synthetic_entity(i: int, base_ms: int = 1_700_000_000_000) -> Dict[str, Any]:
+    """Deterministic DataHub Dataset entity shaped like the portal's search query expects."""
+    return {
+        "urn": f"urn:li:dataset:(urn:li:dataPlatform:postgres,bench.table_{i},PROD)",
+        "properties": {
+            "name": f"bench_table_{i}",
+            "description": f"Synthetic dataset {i} for {DOMAINS[i % len(DOMAINS)].lower()} reporting",
+            "customProperties": [{"key": "freshnessSlaHours", "value": "24"},
+                                 {"key": "updateCadence", "value": "Daily"}] if i % 2 else [],
+        },
+        "lastIngested": base_ms + i * 1000,
+        "domain": {"properties": {"name": DOMAINS[i % len(DOMAINS)]}},
+        "tags": {"tags": [{"tag": {"properties": {"name": TAGS[(i + k) % len(TAGS)]}}} for k in range(3)]},
+    }
+
+class DataHubHandler(_Handler):
+    """POST / : the `search(input: SearchInput!)` GraphQL query with start/count and a modified-since filter."""
+
+    def do_POST(self) -> None:
+        self._count("search")
+        payload = json.loads(self._body() or b"{}")
+        if self.server.faults.apply():
+            self._send(503, {"error": "injected failure"})
+            return
+        if self.headers.get("Authorization", "") != f"Bearer {self.server.options['token']}":
+            self._send(401, {"error": "unauthorized"})
+            return
+        inp = (payload.get("variables") or {}).get("input") or {}
+        start, count = int(inp.get("start", 0)), int(inp.get("count", 10))
+        size = self.server.options["catalog_size"]
+        ids = range(size)
+        for group in inp.get("orFilters") or []:
+            for f in group.get("and") or []:
+                if f.get("condition") == "GREATER_THAN_OR_EQUAL_TO":
+                    since = int(f["values"][0])
+                    ids = [i for i in ids if synthetic_entity(i)["lastIngested"] >= since]
+        ids = list(ids)
+        page = [synthetic_entity(i) for i in ids[start:start + count]]
+        self._send(200, {"data": {"search": {
+            "start": start, "count": len(page), "total": len(ids),
+            "searchResults": [{"entity": e} for e in page],
+        }}})
+
+_ROW_COLUMN = re.compile(r'"((?:[^"]|"")*)"\s*,\s*\[((?:[^\]]|\]\])*)\]')
+
+class PowerBIHandler(_Handler):
+    """AAD tenant discovery + client-credentials token endpoint, and Power BI executeQueries."""
+
+    def do_GET(self) -> None:
+        m = re.match(r"^/([^/]+)/v2\.0/\.well-known/openid-configuration", self.path)
+        if not m:
+            self._send(404, {"error": "not found"})
+            return
+        self._count("openid-configuration")
+        base = f"{self.server.url}/{m.group(1)}"
+        self._send(200, {
+            "issuer": f"{base}/v2.0",
+            "authorization_endpoint": f"{base}/oauth2/v2.0/authorize",
+            "token_endpoint": f"{base}/oauth2/v2.0/token",
+        })
+
+    def do_POST(self) -> None:
+        body = self._body()
+        if re.match(r"^/[^/]+/oauth2/v2\.0/token", self.path):
+            self._count("token")
+            if self.server.faults.apply():
+                self._send(503, {"error": "temporarily_unavailable", "error_description": "injected failure"})
+                return
+            self._send(200, {"token_type": "Bearer", "expires_in": self.server.options["token_ttl_s"],
+                             "access_token": f"stub-{time.time_ns()}"})
+            return
+        if not self.path.endswith("/executeQueries"):
+            self._send(404, {"error": "not found"})
+            return
+        self._count("executeQueries")
+        if self.server.faults.apply():
+            self._send(503, {"error": {"code": "ServiceUnavailable", "message": "injected failure"}})
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer stub-"):
+            self._send(401, {"error": {"code": "TokenExpired"}})
+            return
+        dax = json.loads(body)["queries"][0]["query"]
+        row = {}
+        for key, measure in _ROW_COLUMN.findall(dax):
+            digest = hashlib.sha256(measure.replace("]]", "]").encode()).digest()
+            row[f"[{key.replace(chr(34) * 2, chr(34))}]"] = int.from_bytes(digest[:4], "big") % 10_000_000
+        self._send(200, {"results": [{"tables": [{"rows": [row]}]}]})
+
+def start_datahub(cert_file: str, key_file: str, faults: Faults, catalog_size: int, token: str = "bench") -> StubServer:
+    return StubServer(DataHubHandler, cert_file, key_file, faults, catalog_size=catalog_size, token=token).start()
+
+def start_powerbi(cert_file: str, key_file: str, faults: Faults, token_ttl_s: int = 3600) -> StubServer:
+    return StubServer(PowerBIHandler, cert_file, key_file, faults, token_ttl_s=token_ttl_s).start()
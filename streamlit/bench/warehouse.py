@@ -0,0 +1,139 @@
+"""Synthetic SQLite warehouse with the `fact_*` / `dim_*` tables the portal's templates and rollups read."""
+import os
+import sqlite3
+from typing import Dict
+
+import numpy as np
+
+DEPTS = ["central", "unfip", "advocacy", "partnerships", "gender"]
+CHANNELS = ["Grants", "UN system entities (fiduciary)"]
+INITIATIVES = ["SDG Goals Lounge", "Women Rise for All", "SDG Advocates"]
+START_DAY = np.datetime64("2020-01-01")
+DAYS = 6 * 365
+
+SCHEMA = """
+CREATE TABLE dim_implementing_partner (partner_id INTEGER PRIMARY KEY, partner_name TEXT);
+CREATE TABLE dim_partner (partner_id INTEGER PRIMARY KEY, partner_name TEXT);
+CREATE TABLE dim_country (country_id INTEGER PRIMARY KEY, country_name TEXT);
+CREATE TABLE dim_theme (theme_id INTEGER PRIMARY KEY, theme_name TEXT);
+CREATE TABLE dim_program (program_id INTEGER PRIMARY KEY, program_name TEXT);
+CREATE TABLE dim_initiative (initiative_id INTEGER PRIMARY KEY, initiative_name TEXT);
+CREATE TABLE dim_location (location_id INTEGER PRIMARY KEY, city TEXT);
+CREATE TABLE dim_date (date_key TEXT PRIMARY KEY, year INTEGER, month INTEGER);
+CREATE TABLE fact_unfip_disbursements (
+    disbursement_id INTEGER PRIMARY KEY, disbursement_date TEXT, dept TEXT, funding_channel TEXT,
+    partner_id INTEGER, project_id INTEGER, country_id INTEGER, theme_id INTEGER,
+    disbursed_amount_usd REAL, currency TEXT
+);
+CREATE TABLE fact_initiative_events (
+    event_id INTEGER PRIMARY KEY, event_date TEXT, dept TEXT, initiative_id INTEGER, initiative TEXT,
+    location_id INTEGER, in_person_attendees INTEGER, remote_viewers INTEGER, social_reach INTEGER
+);
+CREATE TABLE fact_partnership_kpis (
+    kpi_row_id INTEGER PRIMARY KEY, kpi_date TEXT, dept TEXT, kpi_id TEXT, partner_id INTEGER,
+    program_id INTEGER, achieved_value REAL, target_value REAL
+);
+CREATE INDEX ix_disb_date ON fact_unfip_disbursements (disbursement_date);
+CREATE INDEX ix_events_date ON fact_initiative_events (event_date);
+CREATE INDEX ix_kpis_date ON fact_partnership_kpis (kpi_date);
+"""
+
+# SQL templates matching the synthetic schema (SQLite dialect)
+SQL_TEMPLATES: Dict[str, str] = {
+    "SQL_FUNDING_BREAKDOWN": (
+        "SELECT funding_channel AS name, SUM(disbursed_amount_usd) AS value FROM fact_unfip_disbursements "
+        "WHERE disbursement_date BETWEEN :start_date AND :end_date GROUP BY funding_channel"
+    ),
+    "SQL_UNFIP_TREND": (
+        "SELECT substr(disbursement_date, 1, 4) AS x, SUM(disbursed_amount_usd) / 1e6 AS disbursed_m "
+        "FROM fact_unfip_disbursements GROUP BY 1 ORDER BY 1"
+    ),
+    "SQL_INITIATIVE_REACH": (
+        "SELECT i.initiative_name AS initiative, SUM(e.in_person_attendees) AS in_person, "
+        "SUM(e.remote_viewers) AS remote FROM fact_initiative_events e "
+        "JOIN dim_initiative i ON i.initiative_id = e.initiative_id "
+        "WHERE e.event_date BETWEEN :start_date AND :end_date GROUP BY i.initiative_name"
+    ),
+}
+
+def _days(rng: np.random.Generator, n: int) -> np.ndarray:
+    return (START_DAY + rng.integers(0, DAYS, n)).astype(str)
+
+def _insert(conn: sqlite3.Connection, table: str, columns: Dict[str, np.ndarray]) -> None:
+    names = list(columns)
+    sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+    conn.executemany(sql, zip(*(c.tolist() for c in columns.values())))
+
+def build_warehouse(path: str, rows: int, seed: int = 7, chunk_rows: int = 500_000) -> str:
+    """Create (or reuse) a warehouse with `rows` disbursements and rows/4 events and KPI rows; returns its DSN."""
+    dsn = f"sqlite:///{os.path.abspath(path)}"
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM bench_meta").fetchall())
+        if meta.get("rows") == str(rows) and meta.get("seed") == str(seed):
+            return dsn
+        os.remove(path)
+
+    rng = np.random.default_rng(seed)
+    n_partners, n_projects, n_countries = 400, max(50, rows // 50), 193
+    conn = sqlite3.connect(path)
+    conn.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + SCHEMA)
+    conn.execute("CREATE TABLE bench_meta (key TEXT PRIMARY KEY, value TEXT)")
+    for table, key, label, n in (("dim_implementing_partner", "partner_id", "partner_name", n_partners),
+                                 ("dim_partner", "partner_id", "partner_name", n_partners),
+                                 ("dim_country", "country_id", "country_name", n_countries),
+                                 ("dim_theme", "theme_id", "theme_name", 17),
+                                 ("dim_program", "program_id", "program_name", 40),
+                                 ("dim_location", "location_id", "city", 60)):
+        conn.executemany(f"INSERT INTO {table} ({key}, {label}) VALUES (?, ?)",
+                         [(i, f"{label.split('_')[0]} {i}") for i in range(1, n + 1)])
+    conn.executemany("INSERT INTO dim_initiative VALUES (?, ?)", list(enumerate(INITIATIVES, start=1)))
+    days = (START_DAY + np.arange(DAYS)).astype(str)
+    conn.executemany("INSERT INTO dim_date VALUES (?, ?, ?)", [(d, int(d[:4]), int(d[5:7])) for d in days.tolist()])
+
+    def chunks(total: int):
+        for start in range(0, total, chunk_rows):
+            yield start, min(chunk_rows, total - start)
+
+    for start, n in chunks(rows):
+        _insert(conn, "fact_unfip_disbursements", {
+            "disbursement_id": np.arange(start, start + n),
+            "disbursement_date": _days(rng, n),
+            "dept": np.array(DEPTS)[rng.integers(0, len(DEPTS), n)],
+            "funding_channel": np.array(CHANNELS)[rng.integers(0, len(CHANNELS), n)],
+            "partner_id": rng.integers(1, n_partners + 1, n),
+            "project_id": rng.integers(1, n_projects + 1, n),
+            "country_id": rng.integers(1, n_countries + 1, n),
+            "theme_id": rng.integers(1, 18, n),
+            "disbursed_amount_usd": np.round(rng.lognormal(10, 1.2, n), 2),
+            "currency": np.full(n, "USD"),
+        })
+    for start, n in chunks(max(1, rows // 4)):
+        initiative = rng.integers(1, len(INITIATIVES) + 1, n)
+        _insert(conn, "fact_initiative_events", {
+            "event_id": np.arange(start, start + n),
+            "event_date": _days(rng, n),
+            "dept": np.array(DEPTS)[rng.integers(0, len(DEPTS), n)],
+            "initiative_id": initiative,
+            "initiative": np.array(INITIATIVES)[initiative - 1],
+            "location_id": rng.integers(1, 61, n),
+            "in_person_attendees": rng.integers(0, 400, n),
+            "remote_viewers": rng.integers(0, 20_000, n),
+            "social_reach": rng.integers(0, 200_000, n),
+        })
+    for start, n in chunks(max(1, rows // 4)):
+        target = np.round(rng.uniform(10, 1000, n), 1)
+        _insert(conn, "fact_partnership_kpis", {
+            "kpi_row_id": np.arange(start, start + n),
+            "kpi_date": _days(rng, n),
+            "dept": np.array(DEPTS)[rng.integers(0, len(DEPTS), n)],
+            "kpi_id": np.array([f"kpi_{k}" for k in range(12)])[rng.integers(0, 12, n)],
+            "partner_id": rng.integers(1, n_partners + 1, n),
+            "program_id": rng.integers(1, 41, n),
+            "achieved_value": np.round(target * rng.uniform(0.3, 1.3, n), 1),
+            "target_value": target,
+        })
+    conn.executemany("INSERT INTO bench_meta VALUES (?, ?)", [("rows", str(rows)), ("seed", str(seed))])
+    conn.commit()
+    conn.close()
+    return dsn
@@ -0,0 +1,57 @@
+"""Headless data layer of the UN Data Portal: catalog, KPI and warehouse adapters.
+
+Importing the package is cheap: submodules (and their pandas / msal / SQLAlchemy /
+pyarrow dependencies) load on first attribute access, and nothing here imports Streamlit.
+Settings come from Streamlit secrets when running inside the app, else from the
+environment.
+"""
+import importlib
+from typing import Any
+
+_EXPORTS = {
+    "Dataset": "models",
+    "KpiDef": "models",
+    "DEPARTMENTS": "config",
+    "secret": "config",
+    "json_secret": "config",
+    "get_dept_config": "config",
+    "resolve_scope": "config",
+    "fingerprint": "config",
+    "format_usd_compact": "formatting",
+    "format_num_compact": "formatting",
+    "format_age": "formatting",
+    "MOCK_DATASETS": "mock",
+    "MOCK_KPIS": "mock",
+    "dataset_sla": "freshness",
+    "refresh_interval_s": "freshness",
+    "staleness_label": "freshness",
+    "ResultCache": "cache",
+    "result_cache": "cache",
+    "catalog_datasets": "datahub",
+    "POWERBI_MEASURES": "powerbi",
+    "powerbi_kpis": "powerbi",
+    "warehouse_query": "warehouse",
+    "warehouse_chart_loaders": "warehouse",
+    "period_bounds": "rollups",
+    "fan_out": "live",
+    "compile_kpis": "formulas",
+    "evaluate_plan": "formulas",
+    "local_kpis": "formulas",
+    "kpi_quality": "quality",
+    "CatalogIndex": "search",
+    "ColumnarCatalog": "columnar",
+    "catalog_columnar": "datahub",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'unportal' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
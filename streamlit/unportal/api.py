@@ -0,0 +1,139 @@
+"""Headless HTTP/JSON API over the data layer, for the React UI and other non-Streamlit clients.
+
+    python -m unportal.api --port 8787            # from the streamlit/ folder
+
+GET /api/kpis/global and /api/catalog/sources accept `scope` (central|department), `dept`
+and `period` query parameters. Live sources are used when configured (environment
+variables, same names as the Streamlit secrets); otherwise, or when a source fails, the
+response falls back and says why in `note`: KPIs to the local formula engine over the
+warehouse, then to mock data; the catalog to mock data. Also serves /health and /metrics
+(Prometheus text).
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from .config import resolve_scope, secret
+from .metrics import metrics
+
+# React UI KPI names served alongside the Power BI measure keys
+GLOBAL_KPI_ALIASES = {"totalFunding": "totalDisbursedUsd", "countriesEngaged": "countriesParticipating"}
+
+def global_kpis(scope: str = "central", dept: str = "central", period: str = "y2024") -> Dict[str, Any]:
+    from .formulas import local_kpis
+    from .powerbi import POWERBI_MEASURES, powerbi_kpis
+
+    note = None
+    try:
+        values, fetched_at = powerbi_kpis(period, scope, dept)
+        source = "powerbi"
+    except Exception as e:
+        note = f"powerbi: {e}"
+        try:
+            values, fetched_at = local_kpis(period, scope, dept)
+            source = "local"
+        except Exception as e2:
+            values, fetched_at = {m.key: m.mock for m in POWERBI_MEASURES}, {}
+            source, note = "mock", f"{note}; local: {e2}"
+    out: Dict[str, Any] = dict(values)
+    out.update({alias: values[key] for alias, key in GLOBAL_KPI_ALIASES.items() if key in values})
+    out.update(scope=scope, dept=dept, period=period, source=source)
+    if fetched_at:
+        out["asOf"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(min(fetched_at.values())))
+    if note:
+        out["note"] = note
+    return out
+
+def catalog_sources(scope: str = "central", dept: str = "central", period: str = "") -> Dict[str, Any]:
+    from .datahub import catalog_datasets
+    from .mock import MOCK_DATASETS
+
+    note = None
+    try:
+        datasets = catalog_datasets(scope, dept, "*")
+        source = "datahub"
+    except Exception as e:
+        datasets = [d for d in MOCK_DATASETS if scope != "department" or d.dept in (dept, "central")]
+        source, note = "mock", str(e)
+    sources: List[Dict[str, Any]] = [
+        dict(asdict(d), kind="dataset", auth="token", notes=d.description) for d in datasets
+    ]
+    out: Dict[str, Any] = {"sources": sources, "scope": scope, "dept": dept, "source": source}
+    if note:
+        out["note"] = note
+    return out
+
+ROUTES: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "/api/kpis/global": global_kpis,
+    "/api/catalog/sources": catalog_sources,
+}
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "unportal-api"
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "*")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            return self._send(200, b'{"ok": true}')
+        if url.path == "/metrics":
+            return self._send(200, metrics().prometheus_text().encode(), "text/plain; version=0.0.4; charset=utf-8")
+        handler = ROUTES.get(url.path.rstrip("/"))
+        if handler is None:
+            return self._send(404, json.dumps({"error": f"no route {url.path}"}).encode())
+        qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        scope, dept = resolve_scope(qs.get("scope", "central"), qs.get("dept", "central"))
+        period = qs.get("period", "y2024")
+        metrics().tags.set({"dept": dept, "period": period})
+        try:
+            with metrics().timed("api", route=url.path):
+                payload = handler(scope=scope, dept=dept, period=period)
+        except Exception as e:
+            return self._send(500, json.dumps({"error": str(e)}).encode())
+        self._send(200, json.dumps(payload, default=str).encode())
+
+    def log_message(self, fmt, *args):
+        pass
+
+def serve(host: str = "127.0.0.1", port: int = 8787) -> ThreadingHTTPServer:
+    """Bind the API server; call `serve_forever()` on the result (or run it on a thread)."""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    return server
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--host", default=secret("API_HOST", "127.0.0.1"))
+    p.add_argument("--port", type=int, default=int(secret("API_PORT", "8787")))
+    args = p.parse_args(argv)
+    server = serve(args.host, args.port)
+    print(f"unportal API on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""Two-tier (memory + SQLite) result cache shared by every source adapter."""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .config import fingerprint, inline_refresh, secret, singleton
+from .metrics import metrics
+
+INVALIDATED = 0.0  # expires_at of an invalidated entry, kept as the last known good value
+
+class SingleFlight:
+    """Process-wide request coalescing: concurrent calls with the same key share one execution.
+
+    The first caller (the leader) runs the call; everyone arriving while it is in flight waits
+    for the leader's result, or its exception, and is counted as merged.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._stats = {"calls": 0, "merged": 0}
+
+    def do(self, key: Tuple[str, ...], fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self._stats["calls"] += 1
+            else:
+                self._stats["merged"] += 1
+        if not leader:
+            metrics().inc("singleflight_merged_total", source=key[0], dept=key[2], period=key[3])
+            return call.result()
+        try:
+            value = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+@singleton
+def single_flight() -> SingleFlight:
+    return SingleFlight()
+
+class ResultCache:
+    """Two-tier result cache keyed on (source, scope, dept, period, query).
+
+    A size-bounded in-memory LRU sits in front of a SQLite tier that survives restarts
+    and is shared by every process pointing at the same file. Entries can be dropped by
+    source and/or department instead of clearing everything.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[Tuple[str, ...], Tuple[Any, float, float, int]]" = OrderedDict()
+        self._mem_bytes = 0
+        self._revalidating: set = set()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0,
+                       "stale_served": 0, "revalidations": 0, "revalidation_errors": 0, "last_good_served": 0}
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    source TEXT, scope TEXT, dept TEXT, period TEXT, query TEXT,
+                    stored_at REAL, expires_at REAL, value BLOB,
+                    PRIMARY KEY (source, scope, dept, period, query)
+                )""")
+
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def _remember(self, key: Tuple[str, ...], value: Any, stored_at: float, expires_at: float, size: int) -> None:
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old:
+                self._mem_bytes -= old[3]
+            self._mem[key] = (value, stored_at, expires_at, size)
+            self._mem_bytes += size
+            while self._mem and (len(self._mem) > self.max_entries or self._mem_bytes > self.max_bytes):
+                _, evicted = self._mem.popitem(last=False)
+                self._mem_bytes -= evicted[3]
+                self._stats["evictions"] += 1
+
+    @staticmethod
+    def _count(key: Tuple[str, ...], result: str) -> None:
+        metrics().inc("cache_requests_total", cache="result", source=key[0], dept=key[2], period=key[3], result=result)
+
+    def get_entry(self, key: Tuple[str, ...], allow_expired: bool = False) -> Optional[Tuple[Any, float, float]]:
+        """(value, stored_at, expires_at) for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit and (allow_expired or hit[2] > now):
+                self._mem.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                self._count(key, "memory_hit")
+                return hit[0], hit[1], hit[2]
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT stored_at, expires_at, value FROM results WHERE source=? AND scope=? AND dept=? AND period=? AND query=?",
+                key,
+            ).fetchone()
+        if row and (allow_expired or row[1] > now):
+            value = pickle.loads(row[2])
+            self._remember(key, value, row[0], row[1], len(row[2]))
+            with self._lock:
+                self._stats["disk_hits"] += 1
+            self._count(key, "disk_hit")
+            return value, row[0], row[1]
+        with self._lock:
+            self._stats["misses"] += 1
+        self._count(key, "miss")
+        return None
+
+    def put(self, key: Tuple[str, ...], value: Any, ttl: float) -> None:
+        stored_at = time.time()
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            blob = None  # not picklable: keep it in memory only
+        self._remember(key, value, stored_at, stored_at + ttl, len(blob) if blob else 0)
+        if blob is not None:
+            with self._conn() as conn:
+                conn.execute("INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?)",
+                             (*key, stored_at, stored_at + ttl, blob))
+
+    def _load(self, key: Tuple[str, ...], ttl: float, loader: Callable[[], Any]) -> Any:
+        """Run `loader` and store its result, sharing one call among concurrent misses on `key`."""
+        def load() -> Any:
+            value = loader()
+            self.put(key, value, ttl)
+            return value
+        return single_flight().do(key, load)
+
+    def get_or_load(self, key: Tuple[str, ...], ttl: float, loader: Callable[[], Any]) -> Any:
+        entry = self.get_entry(key)
+        if entry is not None:
+            return entry[0]
+        return self._load(key, ttl, loader)
+
+    def revalidate_async(self, key: Tuple[str, ...], ttl: float, loader: Callable[[], Any]) -> bool:
+        """Reload `key` on a background thread unless a reload is already running (inline under `inline_refresh`)."""
+        if inline_refresh.get():
+            self._load(key, ttl, loader)
+            with self._lock:
+                self._stats["revalidations"] += 1
+            return True
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+
+        def run() -> None:
+            try:
+                self._load(key, ttl, loader)
+                stat = "revalidations"
+            except Exception:
+                stat = "revalidation_errors"  # keep serving the last good value
+            with self._lock:
+                self._revalidating.discard(key)
+                self._stats[stat] += 1
+
+        threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True, name="cache-revalidate").start()
+        return True
+
+    def get_or_revalidate(self, key: Tuple[str, ...], ttl: float, loader: Callable[[], Any]) -> Tuple[Any, float]:
+        """Stale-while-revalidate: (value, stored_at), blocking only when nothing was ever cached.
+
+        Invalidated entries are reloaded in the foreground, but if that load fails (an open
+        circuit, an outage) the invalidated value is served as the last known good one.
+        """
+        entry = self.get_entry(key, allow_expired=True)
+        if entry is None or entry[2] == INVALIDATED:
+            try:
+                return self._load(key, ttl, loader), time.time()
+            except Exception:
+                if entry is None:
+                    raise
+                return self.last_good(key, entry)
+        value, stored_at, expires_at = entry
+        if expires_at <= time.time():
+            with self._lock:
+                self._stats["stale_served"] += 1
+            self._count(key, "stale")
+            self.revalidate_async(key, ttl, loader)
+        return value, stored_at
+
+    def last_good(self, key: Tuple[str, ...], entry: Tuple[Any, float, float]) -> Tuple[Any, float]:
+        """Serve an invalidated/expired entry because its reload failed; (value, stored_at)."""
+        with self._lock:
+            self._stats["last_good_served"] += 1
+        self._count(key, "last_good")
+        return entry[0], entry[1]
+
+    def invalidate(self, source: Optional[str] = None, dept: Optional[str] = None) -> int:
+        """Force a reload of entries for a source and/or department (both None: everything).
+
+        Entries are marked invalidated rather than deleted, so they remain as the last known
+        good value if the reload fails.
+        """
+        def match(key: Tuple[str, ...]) -> bool:
+            return (source is None or key[0] == source) and (dept is None or key[2] == dept)
+
+        with self._lock:
+            for key in [k for k in self._mem if match(k)]:
+                self._mem_bytes -= self._mem.pop(key)[3]
+        where, args = [], []
+        if source is not None:
+            where.append("source=?"); args.append(source)
+        if dept is not None:
+            where.append("dept=?"); args.append(dept)
+        with self._conn() as conn:
+            sql = f"UPDATE results SET expires_at = {INVALIDATED}" + (" WHERE " + " AND ".join(where) if where else "")
+            return conn.execute(sql, args).rowcount
+
+    def count(self, scope: str, dept: str, source: Optional[str] = None) -> int:
+        """Stored entries for one (scope, dept) view across periods, from one source or all of them."""
+        where, args = "scope=? AND dept=?", [scope, dept]
+        if source is not None:
+            where += " AND source=?"; args.append(source)
+        with self._conn() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM results WHERE {where}", args).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats, memory_entries=len(self._mem), memory_mb=self._mem_bytes / 1e6)
+        lookups = s["memory_hits"] + s["disk_hits"] + s["misses"]
+        s["hit_rate"] = ((s["memory_hits"] + s["disk_hits"]) / lookups) if lookups else 0.0
+        return s
+
+@singleton
+def result_cache() -> ResultCache:
+    return ResultCache(
+        secret("RESULT_CACHE_PATH", ".cache/results.sqlite"),
+        max_entries=int(secret("RESULT_CACHE_MAX_ENTRIES", "256")),
+        max_bytes=int(float(secret("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024),
+    )
+
+def scoped_cache(source: str, ttl: float = 300, hashed: Tuple[str, ...] = ()):
+    """Cache a source adapter in the ResultCache, stale-while-revalidate.
+
+    The wrapped function must take `scope` and `dept` (and optionally `period`) arguments;
+    every other argument is folded into the query part of the key, except `refresh_after_s`,
+    which overrides `ttl` for that call. Arguments named in `hashed` (connection strings and
+    anything else that may carry credentials) enter the key only as a fingerprint.
+    """
+    def deco(fn):
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            rest = dict(bound.arguments)
+            refresh_after = rest.pop("refresh_after_s", None) or ttl
+            for name in hashed:
+                rest[f"{name}_sha256"] = fingerprint(rest.pop(name))
+            key = (source, rest.pop("scope"), rest.pop("dept"), str(rest.pop("period", "")),
+                   json.dumps(rest, sort_keys=True, default=str))
+            return result_cache().get_or_revalidate(key, refresh_after, lambda: fn(*args, **kwargs))[0]
+        return wrapper
+    return deco
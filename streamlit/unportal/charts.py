@@ -0,0 +1,131 @@
+"""Dashboard figures: cached by data + spec hash, LTTB-downsampled, WebGL above a size threshold.
+
+`chart_figure(kind, frame, **spec)` returns the figure as a plain dict. The dict is cached in
+process under a hash of the frame's contents and the spec. A rerun with the same data (any
+widget change, another session on the same department) reuses it instead of rebuilding the
+Plotly figure. Line series longer than CHART_MAX_POINTS are reduced with
+Largest-Triangle-Three-Buckets, which keeps peaks and troughs. Series still longer than
+CHART_WEBGL_THRESHOLD are drawn as `scattergl` traces.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from .config import secret, singleton
+from .metrics import metrics
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the `n_out` points Largest-Triangle-Three-Buckets keeps (first and last always kept)."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = np.asarray(x, dtype=float), np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # n_out - 2 buckets between the end points
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def _numeric_x(s: pd.Series) -> np.ndarray:
+    """x positions for LTTB: numbers and dates as they are, anything else by position."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.to_numpy(dtype=float)
+    as_dates = pd.to_datetime(s, errors="coerce")
+    if not as_dates.isna().any():
+        return as_dates.astype("int64").to_numpy(dtype=float)
+    return np.arange(len(s), dtype=float)
+
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int) -> pd.DataFrame:
+    """At most `max_points` rows of an x-ordered series, chosen by LTTB on `y`."""
+    if len(df) <= max_points:
+        return df
+    xs = _numeric_x(df[x])
+    if not (np.diff(xs) >= 0).all():
+        order = np.argsort(xs, kind="stable")
+        df, xs = df.iloc[order], xs[order]
+    return df.iloc[lttb(xs, df[y].to_numpy(), max_points)]
+
+def _line(df: pd.DataFrame, x: str, y: str, markers: bool = False) -> go.Figure:
+    df = downsample(df, x, y, int(secret("CHART_MAX_POINTS", "2000")))
+    webgl = len(df) > int(secret("CHART_WEBGL_THRESHOLD", "1000"))
+    return px.line(df, x=x, y=y, markers=markers and not webgl, render_mode="webgl" if webgl else "svg")
+
+def _pie(df: pd.DataFrame, names: str, values: str, hole: float = 0.0) -> go.Figure:
+    return px.pie(df, names=names, values=values, hole=hole)
+
+def _grouped_bar(df: pd.DataFrame, x: str, bars: Sequence[Tuple[str, str]]) -> go.Figure:
+    fig = go.Figure()
+    for column, label in bars:
+        fig.add_trace(go.Bar(x=df[x], y=df[column], name=label))
+    fig.update_layout(barmode="group")
+    return fig
+
+CHART_BUILDERS: Dict[str, Callable[..., go.Figure]] = {"line": _line, "pie": _pie, "grouped_bar": _grouped_bar}
+
+def figure_key(kind: str, df: pd.DataFrame, spec: Dict[str, Any]) -> str:
+    """Hash of the chart kind, spec, the settings that shape the figure, and the frame's contents."""
+    h = hashlib.sha256()
+    settings = [secret("CHART_MAX_POINTS", "2000"), secret("CHART_WEBGL_THRESHOLD", "1000")]
+    h.update(json.dumps([kind, spec, settings, list(map(str, df.columns)), list(map(str, df.dtypes))],
+                        sort_keys=True, default=str).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+class FigureCache:
+    """Size-bounded LRU of built figure dicts, shared by every session in the process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._figures: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key: str):
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return fig
+
+    def put(self, key: str, fig: Dict[str, Any]) -> None:
+        with self._lock:
+            self._figures[key] = fig
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._figures), "hits": self.hits, "misses": self.misses}
+
+@singleton
+def figure_cache() -> FigureCache:
+    return FigureCache(int(secret("CHART_CACHE_MAX_ENTRIES", "128")))
+
+def chart_figure(kind: str, df: pd.DataFrame, **spec: Any) -> Dict[str, Any]:
+    """The figure for `kind` (see CHART_BUILDERS) over `df`, built once per distinct data + spec."""
+    key = figure_key(kind, df, spec)
+    cache = figure_cache()
+    fig = cache.get(key)
+    metrics().inc("cache_requests_total", cache="figure", source=kind, result="miss" if fig is None else "hit")
+    if fig is None:
+        fig = CHART_BUILDERS[kind](df, **spec).to_dict()
+        cache.put(key, fig)
+    return fig
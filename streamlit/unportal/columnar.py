@@ -0,0 +1,196 @@
+"""Columnar in-memory catalog: dictionary-encoded fields, interned tags and facet bitmaps.
+
+A `ColumnarCatalog` keeps one column per `Dataset` field instead of one object per dataset.
+Repeated strings (domain, owner, sensitivity, cadence, dept) are stored once in a sorted
+dictionary plus an int32 code per row; tags and tables are offsets plus codes into interned
+vocabularies. Each domain and dept value has a precomputed boolean bitmap, so domain,
+department and certification filters are vectorised ANDs. `DatasetView` reads one row with
+the same attributes as `Dataset`, so the rendering code works on either.
+"""
+import hashlib
+import sys
+from collections.abc import Sequence as SequenceABC
+from dataclasses import fields
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .config import singleton
+from .models import Dataset
+
+DATASET_FIELDS = tuple(f.name for f in fields(Dataset))
+# Low-cardinality string fields, dictionary-encoded
+CATEGORICAL_FIELDS = ("domain", "owner", "sensitivity", "updateCadence", "dept")
+# Fields with a precomputed bitmap per value
+BITMAP_FACETS = ("domain", "dept")
+
+class _Dictionary:
+    """Sorted distinct values and one int32 code per row."""
+
+    def __init__(self, values: Sequence[str]):
+        distinct = sorted({sys.intern(str(v)) for v in values})
+        index = {v: i for i, v in enumerate(distinct)}
+        self.values: List[str] = distinct
+        self.codes = np.fromiter((index[str(v)] for v in values), dtype=np.int32, count=len(values))
+
+    def __getitem__(self, i: int) -> str:
+        return self.values[self.codes[i]]
+
+class _Lists:
+    """A list-of-strings column: row i is codes[offsets[i]:offsets[i + 1]] into the interned `vocab`."""
+
+    def __init__(self, rows: Iterable[Sequence[str]]):
+        index: Dict[str, int] = {}
+        offsets, codes = [0], []
+        for row in rows:
+            codes.extend(index.setdefault(sys.intern(item), len(index)) for item in row)
+            offsets.append(len(codes))
+        self.vocab: List[str] = list(index)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int32)
+
+    def __getitem__(self, i: int) -> List[str]:
+        return [self.vocab[c] for c in self.codes[self.offsets[i]:self.offsets[i + 1]]]
+
+class ColumnarCatalog:
+    """Immutable column store of catalog datasets, in load order.
+
+    Build it with `from_datasets` or straight from `{field: [values]}` columns (see
+    `CatalogStore.load_columnar`). `version` is a content hash, so an unchanged catalog
+    rebuilt from a fresh load compares equal and downstream indexes can skip work.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence[Any]]):
+        self.ids: List[str] = list(columns["id"])
+        self.names: List[str] = list(columns["name"])
+        self.descriptions: List[str] = [d or "" for d in columns["description"]]
+        self.certified = np.asarray(columns["certified"], dtype=bool)
+        self.freshness_sla_hours = np.asarray(columns["freshnessSlaHours"], dtype=np.int32)
+        self.categories = {f: _Dictionary(columns[f]) for f in CATEGORICAL_FIELDS}
+        self.tags = _Lists(columns["tags"])
+        self.tables = _Lists(columns["tables"])
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {
+            f: {v: self.categories[f].codes == i for i, v in enumerate(self.categories[f].values)}
+            for f in BITMAP_FACETS
+        }
+        self.row_of: Dict[str, int] = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        self.version = self._content_hash()
+
+    @classmethod
+    def from_datasets(cls, datasets: Iterable[Dataset]) -> "ColumnarCatalog":
+        datasets = list(datasets)
+        return cls({f: [getattr(d, f) for d in datasets] for f in DATASET_FIELDS})
+
+    def _arrays(self) -> List[np.ndarray]:
+        return [self.certified, self.freshness_sla_hours, self.tags.offsets, self.tags.codes,
+                self.tables.offsets, self.tables.codes] + [c.codes for c in self.categories.values()]
+
+    def _content_hash(self) -> str:
+        h = hashlib.sha256()
+        for strings in [self.ids, self.names, self.descriptions, self.tags.vocab, self.tables.vocab] + \
+                [c.values for c in self.categories.values()]:
+            h.update("\x1f".join(strings).encode())
+            h.update(b"\x1e")
+        for arr in self._arrays():
+            h.update(arr.tobytes())
+        return h.hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i: int) -> "DatasetView":
+        return DatasetView(self, int(i))
+
+    def __iter__(self) -> Iterator["DatasetView"]:
+        return (DatasetView(self, i) for i in range(len(self.ids)))
+
+    def mask(self, domain: Optional[str] = None, depts: Optional[Tuple[str, ...]] = None,
+             certified: Optional[bool] = None) -> np.ndarray:
+        """Boolean bitmap of the rows passing every given filter."""
+        out = np.ones(len(self.ids), dtype=bool)
+        if domain:
+            out &= self.bitmaps["domain"].get(domain, False)
+        if depts:
+            out &= np.logical_or.reduce([self.bitmaps["dept"].get(d, np.zeros(len(self.ids), dtype=bool))
+                                         for d in depts])
+        if certified is not None:
+            out &= self.certified if certified else ~self.certified
+        return out
+
+    def facet_values(self, facet: str, within: Optional[np.ndarray] = None) -> List[str]:
+        """Sorted values of a bitmap facet, optionally only those present among the `within` rows."""
+        bitmaps = self.bitmaps[facet]
+        if within is None:
+            return list(bitmaps)
+        return [v for v, bits in bitmaps.items() if (bits & within).any()]
+
+    def rows(self, idx: Union[np.ndarray, Sequence[int]]) -> "CatalogRows":
+        return CatalogRows(self, np.asarray(idx, dtype=np.int64))
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns, bitmaps and distinct strings."""
+        arrays = self._arrays() + [bits for facet in self.bitmaps.values() for bits in facet.values()]
+        strings = self.ids + self.names + self.descriptions + self.tags.vocab + self.tables.vocab
+        strings += [v for c in self.categories.values() for v in c.values]
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(s) for s in strings)
+
+class CatalogRows(SequenceABC):
+    """A selection of catalog rows; views are only created for the rows actually read."""
+
+    def __init__(self, catalog: ColumnarCatalog, idx: np.ndarray):
+        self.catalog, self.idx = catalog, idx
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return CatalogRows(self.catalog, self.idx[i])
+        return DatasetView(self.catalog, int(self.idx[i]))
+
+    def __iter__(self) -> Iterator["DatasetView"]:
+        return (DatasetView(self.catalog, int(i)) for i in self.idx)
+
+def _category(field: str) -> property:
+    return property(lambda self: self._catalog.categories[field][self._row])
+
+class DatasetView:
+    """Read-only `Dataset` lookalike over one catalog row; `to_dataset()` materialises it."""
+
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog: ColumnarCatalog, row: int):
+        self._catalog, self._row = catalog, row
+
+    id = property(lambda self: self._catalog.ids[self._row])
+    name = property(lambda self: self._catalog.names[self._row])
+    description = property(lambda self: self._catalog.descriptions[self._row])
+    certified = property(lambda self: bool(self._catalog.certified[self._row]))
+    freshnessSlaHours = property(lambda self: int(self._catalog.freshness_sla_hours[self._row]))
+    tags = property(lambda self: self._catalog.tags[self._row])
+    tables = property(lambda self: self._catalog.tables[self._row])
+    domain = _category("domain")
+    owner = _category("owner")
+    sensitivity = _category("sensitivity")
+    updateCadence = _category("updateCadence")
+    dept = _category("dept")
+
+    def to_dataset(self) -> Dataset:
+        return Dataset(**{f: getattr(self, f) for f in DATASET_FIELDS})
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, DatasetView):
+            return self._catalog is other._catalog and self._row == other._row
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash((id(self._catalog), self._row))
+
+    def __repr__(self) -> str:
+        return f"DatasetView(id={self.id!r}, name={self.name!r})"
+
+@singleton
+def mock_catalog() -> ColumnarCatalog:
+    """MOCK_DATASETS as a columnar catalog, built once per process."""
+    from .mock import MOCK_DATASETS
+    return ColumnarCatalog.from_datasets(MOCK_DATASETS)
@@ -0,0 +1,87 @@
+"""Settings, department overrides and process-wide helpers shared by every adapter."""
+import contextvars
+import functools
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEPARTMENTS = [
+    {"id": "central", "name": "Central (UN-wide)"},
+    {"id": "unfip", "name": "UNFIP / Funding"},
+    {"id": "advocacy", "name": "Advocacy / Comms"},
+    {"id": "partnerships", "name": "Partnerships / Ops"},
+    {"id": "gender", "name": "Gender / Women Rise"},
+]
+
+PERIODS = ["y2024", "y2025", "last_30d", "last_6m"]
+
+# Batch jobs (unportal.prewarm) set this so refreshes that are due run on the calling thread,
+# and raise, instead of being handed to a background thread the process may exit before.
+inline_refresh: "contextvars.ContextVar[bool]" = contextvars.ContextVar("inline_refresh", default=False)
+
+def secret(key: str, default: Optional[str] = None) -> Optional[str]:
+    """`key` from Streamlit secrets when running inside the app, else from the environment."""
+    st = sys.modules.get("streamlit")  # never import Streamlit just to read a setting
+    if st is not None:
+        try:
+            value = st.secrets.get(key)
+        except Exception:  # no secrets.toml
+            value = None
+        if value is not None:
+            return value
+    return os.getenv(key, default)
+
+def json_secret(key: str, default=None):
+    raw = secret(key)
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except Exception:
+        return default
+
+def get_dept_config(scope: str, dept: str) -> Dict[str, Any]:
+    cfg = json_secret("DEPARTMENT_CONFIG_JSON", {}) or {}
+    out = {}
+    if isinstance(cfg.get("central", {}), dict):
+        out.update(cfg.get("central", {}))
+    if scope == "department" and isinstance(cfg.get(dept, {}), dict):
+        out.update(cfg.get(dept, {}))
+    return out
+
+def resolve_scope(scope: str, dept: str) -> Tuple[str, str]:
+    """(scope, dept) as the adapters key them: central mode always reads as the central department."""
+    if scope != "department":
+        return "central", "central"
+    return "department", dept
+
+def fingerprint(value: Any) -> str:
+    """Short SHA-256 of a DSN or other secret, for keys and names that are stored or shown."""
+    return hashlib.sha256(str(value).encode()).hexdigest()[:16]
+
+@functools.lru_cache(maxsize=None)
+def optional_import(name: str) -> Any:
+    """Import a heavy/optional dependency on first use; None when it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except Exception:
+        return None
+
+def singleton(fn: Callable[..., T]) -> Callable[..., T]:
+    """One instance per process (and per argument tuple), created on first call."""
+    lock = threading.Lock()
+    cached = functools.lru_cache(maxsize=None)(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any) -> T:
+        with lock:
+            return cached(*args)
+
+    wrapper.cache_clear = cached.cache_clear  # type: ignore[attr-defined]
+    return wrapper
@@ -0,0 +1,356 @@
+"""DataHub GraphQL adapter and the local catalog store it keeps in sync."""
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .cache import single_flight
+from .columnar import ColumnarCatalog
+from .config import get_dept_config, inline_refresh, secret, singleton
+from .metrics import metrics
+from .models import Dataset
+from .resilience import guarded_call, http_error
+
+DATAHUB_SEARCH_GQL = """
+query search($input: SearchInput!) {
+  search(input: $input) {
+    start
+    count
+    total
+    searchResults {
+      entity {
+        urn
+        ... on Dataset {
+          lastIngested
+          properties { name description customProperties { key value } }
+          domain { properties { name } }
+          tags { tags { tag { properties { name } } } }
+        }
+      }
+    }
+  }
+}"""
+
+class DataHubSearchError(RuntimeError):
+    """DataHub answered but rejected the search (GraphQL errors or HTTP 400), e.g. an unsupported filter."""
+
+def _datahub_creds() -> Tuple[str, str]:
+    endpoint = secret("DATAHUB_GQL_ENDPOINT")
+    token = secret("DATAHUB_TOKEN")
+    if not endpoint or not token:
+        raise RuntimeError("Missing DataHub creds (DATAHUB_GQL_ENDPOINT / DATAHUB_TOKEN).")
+    return endpoint, token
+
+def _datahub_search_page(endpoint: str, token: str, query: str, start: int, count: int,
+                         filters: Optional[List[Dict[str, Any]]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    search_input: Dict[str, Any] = {"type": "DATASET", "query": query, "start": start, "count": count}
+    if filters:
+        search_input["orFilters"] = [{"and": filters}]
+    gql = {"query": DATAHUB_SEARCH_GQL, "variables": {"input": search_input}}
+
+    def post(timeout_s: float) -> requests.Response:
+        with metrics().timed("datahub_search"):
+            r = requests.post(endpoint, headers={"Authorization": f"Bearer {token}", "Content-Type":"application/json"},
+                              data=json.dumps(gql), timeout=timeout_s)
+        metrics().payload("datahub_search", len(r.content))
+        if r.status_code >= 300:
+            metrics().inc("errors_total", op="datahub_search", error=f"http_{r.status_code}")
+            if r.status_code == 400:
+                raise DataHubSearchError(f"DataHub search failed: 400 {r.text[:500]}")
+            raise http_error("DataHub search", r)
+        return r
+
+    data = guarded_call("datahub", endpoint, post).json()
+    if data.get("errors") and not data.get("data"):
+        raise DataHubSearchError(f"DataHub search failed: {str(data['errors'])[:500]}")
+    search = (data.get("data") or {}).get("search") or {}
+    entities = [item.get("entity", {}) or {} for item in search.get("searchResults", []) or []]
+    return entities, int(search.get("total") or 0)
+
+def _dataset_from_entity(ds: Dict[str, Any], dept: str) -> Tuple[Dataset, int, bool]:
+    """(dataset, DataHub modification time, whether the entity declares its freshness SLA).
+
+    The SLA and cadence come from the `freshnessSlaHours` and `updateCadence` custom properties.
+    """
+    props = ds.get("properties", {}) or {}
+    custom = {kv.get("key"): kv.get("value") for kv in (props.get("customProperties") or []) if kv}
+    try:
+        sla_hours = int(float(custom["freshnessSlaHours"]))
+    except (KeyError, TypeError, ValueError):
+        sla_hours = None
+    domain = (ds.get("domain", {}) or {}).get("properties", {}).get("name", "Unknown")
+    tags = [(((t or {}).get("tag", {}) or {}).get("properties", {}) or {}).get("name")
+            for t in ((ds.get("tags", {}) or {}).get("tags", []) or [])]
+    tags = [t for t in tags if t]
+    modified_at = int(ds.get("lastIngested") or 0)  # when DataHub last wrote the entity, metadata edits included
+    return Dataset(
+        id=ds.get("urn", props.get("name","dataset")),
+        name=props.get("name") or ds.get("urn") or "Dataset",
+        domain=domain,
+        sensitivity="Internal",
+        certified=True,
+        owner="Unassigned",
+        updateCadence=custom.get("updateCadence") or "Unknown",
+        freshnessSlaHours=sla_hours or 168,
+        description=props.get("description") or "",
+        tables=[],
+        tags=tags,
+        dept=dept,
+    ), modified_at, bool(sla_hours)
+
+class CatalogStore:
+    """Local SQLite mirror of the DataHub catalog, one slice per (dept, search query).
+
+    Reads never touch DataHub; `sync_datahub_catalog` keeps the slices current.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._syncing: set = set()
+        self._columnar: Dict[str, Tuple[Any, ColumnarCatalog]] = {}
+        self._slas: Optional[Tuple[float, Dict[str, Tuple[int, str]]]] = None
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS datasets (
+                    catalog TEXT NOT NULL, urn TEXT NOT NULL, name TEXT, domain TEXT, description TEXT,
+                    tags TEXT, dept TEXT, last_modified INTEGER, synced_at REAL,
+                    sla_hours INTEGER, cadence TEXT, sla_declared INTEGER DEFAULT 0,
+                    PRIMARY KEY (catalog, urn)
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    catalog TEXT PRIMARY KEY, watermark INTEGER, total INTEGER,
+                    last_sync REAL, last_full_sync REAL, last_error TEXT
+                );
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def upsert(self, catalog: str, rows: List[Tuple[Dataset, int, bool]]) -> None:
+        now = time.time()
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO datasets (catalog, urn, name, domain, description, tags, dept, last_modified,"
+                " synced_at, sla_hours, cadence, sla_declared) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+                [(catalog, d.id, d.name, d.domain, d.description, json.dumps(d.tags), d.dept, lm, now,
+                  d.freshnessSlaHours, d.updateCadence, int(declared)) for d, lm, declared in rows],
+            )
+        self._slas = None
+
+    def prune(self, catalog: str, before: float) -> int:
+        """Drop entities a full sync did not see again (deleted or no longer matching)."""
+        with self._conn() as conn:
+            pruned = conn.execute("DELETE FROM datasets WHERE catalog=? AND synced_at<?", (catalog, before)).rowcount
+        self._slas = None
+        return pruned
+
+    def declared_slas(self, max_age_s: float = 60.0) -> Dict[str, Tuple[int, str]]:
+        """(freshness SLA hours, update cadence) of every synced dataset that declares one, by URN and by name.
+
+        Re-read after this process writes to the store, or after `max_age_s` for syncs run by other processes.
+        """
+        memo = self._slas
+        if memo is not None and time.time() - memo[0] < max_age_s:
+            return memo[1]
+        with self._conn() as conn:
+            rows = conn.execute("SELECT urn, name, sla_hours, cadence FROM datasets WHERE sla_declared=1").fetchall()
+        slas: Dict[str, Tuple[int, str]] = {}
+        for urn, name, hours, cadence in rows:
+            slas[urn] = slas[name] = (int(hours), cadence or "Unknown")
+        self._slas = (time.time(), slas)
+        return slas
+
+    def load(self, catalog: str) -> List[Dataset]:
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT urn, name, domain, description, tags, dept, sla_hours, cadence"
+                " FROM datasets WHERE catalog=? ORDER BY name",
+                (catalog,),
+            ).fetchall()
+        return [Dataset(id=urn, name=name, domain=domain, sensitivity="Internal", certified=True, owner="Unassigned",
+                        updateCadence=cadence, freshnessSlaHours=sla, description=desc or "",
+                        tables=[], tags=json.loads(tags or "[]"), dept=dept)
+                for urn, name, domain, desc, tags, dept, sla, cadence in rows]
+
+    def load_columnar(self, catalog: str) -> ColumnarCatalog:
+        """The slice as a `ColumnarCatalog`, built from the rows without `Dataset` objects.
+
+        Rebuilt only after a sync has written to the slice; until then every rerun gets the same instance.
+        """
+        state = self.state(catalog) or {}
+        stamp = (state.get("last_sync"), state.get("watermark"), state.get("total"))
+        with self._lock:
+            cached = self._columnar.get(catalog)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with self._conn() as conn:
+            rows = conn.execute(
+                "SELECT urn, name, domain, description, tags, dept, sla_hours, cadence"
+                " FROM datasets WHERE catalog=? ORDER BY name",
+                (catalog,),
+            ).fetchall()
+        n = len(rows)
+        urns, names, domains, descs, tags, depts, slas, cadences = zip(*rows) if rows else ([],) * 8
+        columnar = ColumnarCatalog({
+            "id": urns, "name": names, "domain": domains, "description": descs,
+            "tags": [json.loads(t or "[]") for t in tags], "dept": depts, "tables": [[]] * n,
+            "sensitivity": ["Internal"] * n, "certified": [True] * n, "owner": ["Unassigned"] * n,
+            "updateCadence": cadences, "freshnessSlaHours": slas,
+        })
+        with self._lock:
+            self._columnar[catalog] = (stamp, columnar)
+        return columnar
+
+    def state(self, catalog: str) -> Optional[Dict[str, Any]]:
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT watermark, total, last_sync, last_full_sync, last_error FROM sync_state WHERE catalog=?",
+                (catalog,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["watermark", "total", "last_sync", "last_full_sync", "last_error"], row))
+
+    def save_state(self, catalog: str, **fields: Any) -> None:
+        state = self.state(catalog) or {"watermark": 0, "total": 0, "last_sync": 0.0, "last_full_sync": 0.0, "last_error": None}
+        state.update(fields)
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?,?,?,?,?,?)",
+                         (catalog, state["watermark"], state["total"], state["last_sync"],
+                          state["last_full_sync"], state["last_error"]))
+
+    def invalidate(self, owner: Optional[str] = None) -> int:
+        """Make the next read of a department's slices (every slice if None) sync first.
+
+        The rows are kept, so they are still served if that sync fails.
+        """
+        where, args = ("", []) if owner is None else (" WHERE substr(catalog, 1, ?) = ?", [len(owner) + 1, f"{owner}|"])
+        with self._conn() as conn:
+            return conn.execute("UPDATE sync_state SET last_sync = 0" + where, args).rowcount
+
+    def try_begin_sync(self, catalog: str) -> bool:
+        with self._lock:
+            if catalog in self._syncing:
+                return False
+            self._syncing.add(catalog)
+            return True
+
+    def end_sync(self, catalog: str) -> None:
+        with self._lock:
+            self._syncing.discard(catalog)
+
+def sync_datahub_catalog(store: CatalogStore, catalog: str, endpoint: str, token: str, query: str, dept: str,
+                         page_size: int = 200, full_sync_every_s: float = 86400.0,
+                         modified_field: str = "lastIngested") -> Dict[str, Any]:
+    """Stream every page of a DataHub search into the store.
+
+    Incremental runs only ask for entities whose DataHub modification time (`lastIngested`, the
+    same timestamp the watermark is taken from) is at or after the stored watermark. The bound is
+    inclusive, so entities sharing the watermark's timestamp are not lost, and re-fetched ones are
+    deduplicated by URN. A periodic full run re-reads everything, which also picks up entities
+    without a timestamp, and prunes entities that disappeared. If DataHub rejects the
+    modified-since filter, the run falls back to a full sync.
+    """
+    state = store.state(catalog) or {}
+    started = time.time()
+    watermark = int(state.get("watermark") or 0)
+    full = not watermark or started - float(state.get("last_full_sync") or 0) >= full_sync_every_s
+    filters = None if full else [{"field": modified_field, "values": [str(watermark)],
+                                  "condition": "GREATER_THAN_OR_EQUAL_TO"}]
+
+    start, total, high = 0, 0, watermark
+    seen: set = set()
+    while True:
+        try:
+            entities, total = _datahub_search_page(endpoint, token, query, start, page_size, filters)
+        except DataHubSearchError:
+            if filters is None:
+                raise
+            filters, full, start, seen = None, True, 0, set()
+            continue
+        if not entities:
+            break
+        rows = [row for row in (_dataset_from_entity(ds, dept) for ds in entities) if row[0].id not in seen]
+        seen.update(d.id for d, _, _ in rows)
+        store.upsert(catalog, rows)
+        high = max([high] + [modified_at for _, modified_at, _ in rows])
+        start += len(entities)
+        if start >= total:
+            break
+
+    pruned = store.prune(catalog, started) if full else 0
+    fields: Dict[str, Any] = {"watermark": high, "last_sync": time.time(), "last_error": None}
+    if full:
+        fields.update(total=total, last_full_sync=started)
+    store.save_state(catalog, **fields)
+    return {"full": full, "fetched": len(seen), "pruned": pruned, "seconds": time.time() - started}
+
+@singleton
+def catalog_store() -> CatalogStore:
+    return CatalogStore(secret("CATALOG_DB_PATH", ".cache/catalog.sqlite"))
+
+def synced_slas() -> Dict[str, Tuple[int, str]]:
+    """SLAs declared in the local catalog store; empty when nothing was ever synced (e.g. mock mode)."""
+    if not os.path.exists(secret("CATALOG_DB_PATH", ".cache/catalog.sqlite")):
+        return {}
+    return catalog_store().declared_slas()
+
+def _run_catalog_sync(store: CatalogStore, catalog: str, reraise: bool = True, **kwargs: Any) -> None:
+    try:
+        sync_datahub_catalog(store, catalog, **kwargs)
+    except Exception as e:
+        store.save_state(catalog, last_error=str(e)[:500])
+        if reraise:
+            raise
+    finally:
+        store.end_sync(catalog)
+
+def _catalog_slice(scope: str, dept: str, query: str) -> Tuple[CatalogStore, str]:
+    """The store slice for (scope, dept, query): synced first if it never was or was invalidated, else in the background."""
+    endpoint, token = _datahub_creds()
+    cfg = get_dept_config(scope, dept)
+    effective_query = cfg.get("DATAHUB_QUERY") or query
+    owner = dept if scope == "department" else "central"
+    catalog = f"{owner}|{effective_query}"
+
+    store = catalog_store()
+    state = store.state(catalog)
+    stale = state is None or time.time() - float(state.get("last_sync") or 0) >= float(secret("DATAHUB_SYNC_INTERVAL_S", "300"))
+    if not stale:
+        return store, catalog
+    kwargs = dict(endpoint=endpoint, token=token, query=effective_query, dept=owner,
+                  page_size=int(secret("DATAHUB_PAGE_SIZE", "200")),
+                  full_sync_every_s=float(secret("DATAHUB_FULL_SYNC_S", "86400")),
+                  modified_field=secret("DATAHUB_MODIFIED_FIELD", "lastIngested"))
+    if state is None or not state.get("last_sync") or inline_refresh.get():
+        # never synced or invalidated: the sync blocks, and concurrent sessions wait for that same sync;
+        # if a slice that was synced before fails to refresh, its stored rows are served as they are
+        synced_before = bool(state and state.get("last_full_sync"))
+
+        def sync() -> None:
+            if store.try_begin_sync(catalog):
+                _run_catalog_sync(store, catalog, reraise=not synced_before, **kwargs)
+        single_flight().do(("datahub", scope, owner, "", catalog), sync)
+    elif store.try_begin_sync(catalog):
+        threading.Thread(target=contextvars.copy_context().run, args=(_run_catalog_sync, store, catalog, False), kwargs=kwargs,
+                         daemon=True, name="catalog-sync").start()
+    return store, catalog
+
+def catalog_datasets(scope: str, dept: str, query: str = "*") -> List[Dataset]:
+    """Serve the catalog from the local store; DataHub is only hit by (background) syncs."""
+    store, catalog = _catalog_slice(scope, dept, query)
+    return store.load(catalog)
+
+def catalog_columnar(scope: str, dept: str, query: str = "*") -> ColumnarCatalog:
+    """`catalog_datasets` as a shared `ColumnarCatalog` (what the app holds in memory)."""
+    store, catalog = _catalog_slice(scope, dept, query)
+    return store.load_columnar(catalog)
@@ -0,0 +1,24 @@
+"""Compact number and age formatting for KPI tiles and captions."""
+
+def format_usd_compact(n: float) -> str:
+    n = float(n)
+    a = abs(n)
+    if a >= 1_000_000_000: return f"${n/1_000_000_000:.1f}B"
+    if a >= 1_000_000:     return f"${n/1_000_000:.1f}M"
+    if a >= 1_000:         return f"${n/1_000:.1f}K"
+    return f"${n:.0f}"
+
+def format_num_compact(n: float) -> str:
+    n = float(n)
+    a = abs(n)
+    if a >= 1_000_000_000: return f"{n/1_000_000_000:.1f}B"
+    if a >= 1_000_000:     return f"{n/1_000_000:.1f}M"
+    if a >= 1_000:         return f"{n/1_000:.1f}K"
+    return f"{n:.0f}"
+
+def format_age(seconds: float) -> str:
+    s = max(0.0, float(seconds))
+    if s >= 86400: return f"{s/86400:.0f}d"
+    if s >= 3600:  return f"{s/3600:.0f}h"
+    if s >= 60:    return f"{s/60:.0f}m"
+    return f"{s:.0f}s"
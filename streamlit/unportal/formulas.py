@@ -0,0 +1,386 @@
+"""Local KPI engine: compile SQL-like KPI formulas and evaluate them over warehouse fact frames.
+
+Formulas are arithmetic over aggregates, e.g. `SUM(in_person_attendees) + SUM(remote_viewers)`:
+
+    expr   := term (('+' | '-') term)*
+    term   := factor (('*' | '/') factor)*
+    factor := NUMBER | '-' factor | '(' expr ')' | agg
+    agg    := FUNC '(' ['DISTINCT'] (column | '*') ')' ['FILTER' '(' 'WHERE' pred ('AND' pred)* ')']
+    pred   := column ('=' | '!=' | '<>') literal | column 'IN' '(' literal (',' literal)* ')'
+    FUNC   := SUM | COUNT | AVG | MIN | MAX
+
+Columns may be qualified (`fact_unfip_disbursements.project_id`); unqualified columns belong to the
+KPI's fact table. Every KPI is compiled into one plan in which identical aggregates appear once.
+Evaluation runs one grouped pass per fact table and period, and the arithmetic runs on whole
+columns, so all departments are computed together.
+"""
+import json
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import result_cache
+from .config import fingerprint, get_dept_config, json_secret, secret
+from .freshness import refresh_interval_s
+from .metrics import metrics
+from .rollups import ROLLUP_SPECS, period_bounds, rollup_specs
+
+class FormulaError(ValueError):
+    """A KPI formula that does not parse or references an unknown fact."""
+
+_TOKEN = re.compile(r"\s*(?:(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|('(?:[^']|'')*')|([A-Za-z_][A-Za-z0-9_.]*)|(<>|!=|[-+*/(),=]))")
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FUNCS = {"SUM": "sum", "COUNT": "count", "AVG": "mean", "MIN": "min", "MAX": "max"}
+_ADDITIVE = {"sum", "count", "nunique"}  # empty groups read as 0, not missing
+
+@dataclass(frozen=True)
+class Aggregate:
+    fact: str
+    func: str  # pandas reduction: sum, count, mean, min, max, nunique
+    column: Optional[str]  # None for COUNT(*)
+    where: Tuple[Tuple[str, str, Tuple[Any, ...]], ...] = ()
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise FormulaError(f"unexpected input at {pos}: {text[pos:pos + 20]!r}")
+        num, string, name, op = m.groups()
+        if num is not None:
+            tokens.append(("num", num))
+        elif string is not None:
+            tokens.append(("str", string[1:-1].replace("''", "'")))
+        elif name is not None:
+            tokens.append(("name", name))
+        else:
+            tokens.append(("op", op))
+        pos = m.end()
+    return tokens
+
+class _Parser:
+    def __init__(self, text: str, fact: str):
+        self.tokens, self.i, self.fact = _tokenize(text), 0, fact
+
+    def peek(self, kind: str, value: Optional[str] = None) -> bool:
+        if self.i >= len(self.tokens):
+            return False
+        k, v = self.tokens[self.i]
+        return k == kind and (value is None or v.upper() == value)
+
+    def take(self, kind: str, value: Optional[str] = None) -> str:
+        if not self.peek(kind, value):
+            got = self.tokens[self.i][1] if self.i < len(self.tokens) else "end of formula"
+            raise FormulaError(f"expected {value or kind}, got {got!r}")
+        self.i += 1
+        return self.tokens[self.i - 1][1]
+
+    def parse(self):
+        node = self.expr()
+        if self.i != len(self.tokens):
+            raise FormulaError(f"unexpected {self.tokens[self.i][1]!r}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek("op", "+") or self.peek("op", "-"):
+            node = (self.take("op"), node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while self.peek("op", "*") or self.peek("op", "/"):
+            node = (self.take("op"), node, self.factor())
+        return node
+
+    def factor(self):
+        if self.peek("num"):
+            return ("num", float(self.take("num")))
+        if self.peek("op", "-"):
+            self.take("op")
+            return ("neg", self.factor())
+        if self.peek("op", "("):
+            self.take("op")
+            node = self.expr()
+            self.take("op", ")")
+            return node
+        return ("agg", self.aggregate())
+
+    def column(self) -> Tuple[str, str]:
+        name = self.take("name")
+        fact, _, col = name.rpartition(".")
+        fact = fact or self.fact
+        if not _IDENT.match(col) or not _IDENT.match(fact):
+            raise FormulaError(f"bad column reference {name!r}")
+        return fact, col
+
+    def aggregate(self) -> Aggregate:
+        func = self.take("name").upper()
+        if func not in _FUNCS:
+            raise FormulaError(f"unknown aggregate {func}")
+        self.take("op", "(")
+        distinct = self.peek("name", "DISTINCT")
+        if distinct:
+            self.take("name")
+        if self.peek("op", "*"):
+            self.take("op")
+            if func != "COUNT" or distinct:
+                raise FormulaError("only COUNT(*) may use *")
+            fact, col = self.fact, None
+        else:
+            fact, col = self.column()
+        self.take("op", ")")
+        if distinct and func != "COUNT":
+            raise FormulaError("DISTINCT is only supported in COUNT")
+        where: List[Tuple[str, str, Tuple[Any, ...]]] = []
+        if self.peek("name", "FILTER"):
+            self.take("name")
+            self.take("op", "(")
+            self.take("name", "WHERE")
+            while True:
+                where.append(self.predicate(fact))
+                if not self.peek("name", "AND"):
+                    break
+                self.take("name")
+            self.take("op", ")")
+        return Aggregate(fact, "nunique" if distinct else _FUNCS[func], col, tuple(sorted(where)))
+
+    def literal(self) -> Any:
+        if self.peek("str"):
+            return self.take("str")
+        negative = self.peek("op", "-")
+        if negative:
+            self.take("op")
+        value = float(self.take("num"))
+        return -value if negative else value
+
+    def predicate(self, fact: str) -> Tuple[str, str, Tuple[Any, ...]]:
+        pred_fact, col = self.column()
+        if pred_fact != fact:
+            raise FormulaError(f"FILTER on {pred_fact}.{col} must use the aggregate's table {fact}")
+        if self.peek("name", "IN"):
+            self.take("name")
+            self.take("op", "(")
+            values = [self.literal()]
+            while self.peek("op", ","):
+                self.take("op")
+                values.append(self.literal())
+            self.take("op", ")")
+            return col, "in", tuple(values)
+        op = self.take("op")
+        if op not in ("=", "!=", "<>"):
+            raise FormulaError(f"unsupported comparison {op!r}")
+        return col, "in" if op == "=" else "not in", (self.literal(),)
+
+@dataclass
+class KpiPlan:
+    """Compiled KPIs: the distinct aggregates to compute and each KPI's expression over them."""
+
+    aggregates: List[Aggregate]
+    exprs: Dict[str, Any]  # KPI key -> AST whose leaves are ("slot", i) into `aggregates`
+
+    def facts(self) -> List[str]:
+        return sorted({a.fact for a in self.aggregates})
+
+    def columns(self, fact: str) -> List[str]:
+        cols = set()
+        for a in self.aggregates:
+            if a.fact == fact:
+                cols.update([a.column] if a.column else [])
+                cols.update(c for c, _, _ in a.where)
+        return sorted(cols)
+
+def compile_kpis(formulas: Dict[str, Tuple[str, str]]) -> KpiPlan:
+    """Compile {kpi key: (formula, default fact table)} into one plan with shared aggregates."""
+    slots: Dict[Aggregate, int] = {}
+    aggregates: List[Aggregate] = []
+
+    def intern(node):
+        if node[0] == "agg":
+            if node[1] not in slots:
+                slots[node[1]] = len(aggregates)
+                aggregates.append(node[1])
+            return ("slot", slots[node[1]])
+        if node[0] == "num":
+            return node
+        if node[0] == "neg":
+            return ("neg", intern(node[1]))
+        return (node[0], intern(node[1]), intern(node[2]))
+
+    exprs = {}
+    for key, (formula, fact) in formulas.items():
+        try:
+            exprs[key] = intern(_Parser(formula, fact).parse())
+        except FormulaError as e:
+            raise FormulaError(f"{key}: {e}") from None
+    return KpiPlan(aggregates, exprs)
+
+def _mask(frame: pd.DataFrame, where: Sequence[Tuple[str, str, Tuple[Any, ...]]]) -> Optional[np.ndarray]:
+    mask = None
+    for col, op, values in where:
+        m = frame[col].isin(values).to_numpy()
+        m = ~m if op == "not in" else m
+        mask = m if mask is None else mask & m
+    return mask
+
+def _eval(node, table: pd.DataFrame):
+    kind = node[0]
+    if kind == "slot":
+        return table[f"a{node[1]}"]
+    if kind == "num":
+        return node[1]
+    if kind == "neg":
+        return -_eval(node[1], table)
+    left, right = _eval(node[1], table), _eval(node[2], table)
+    if kind == "+":
+        return left + right
+    if kind == "-":
+        return left - right
+    if kind == "*":
+        return left * right
+    if not isinstance(left, pd.Series) and not isinstance(right, pd.Series):
+        return left / right if right else np.nan  # DIVIDE(): blank on zero, like the column case
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = left / right
+    return out.replace([np.inf, -np.inf], np.nan)
+
+def evaluate_plan(plan: KpiPlan, frames: Dict[str, pd.DataFrame], date_columns: Dict[str, str],
+                  periods: Sequence[str], dept_column: str = "dept", today: Optional[date] = None) -> pd.DataFrame:
+    """KPI values indexed by (dept, period), one column per KPI.
+
+    Every department present in the data gets a row, plus "central" for the UN-wide total
+    over all rows. Each aggregate becomes one input column (NaN where its FILTER rejects the
+    row), so a single groupby per fact table and period computes all of them at once.
+    """
+    parts = []
+    for fact in plan.facts():
+        frame = frames[fact]
+        slots = [(i, a) for i, a in enumerate(plan.aggregates) if a.fact == fact]
+        inputs = {}
+        for i, agg in slots:
+            col = frame[agg.column] if agg.column else pd.Series(1.0, index=frame.index)
+            if agg.func not in ("nunique", "count") and not pd.api.types.is_numeric_dtype(col):
+                col = pd.to_numeric(col, errors="coerce")  # e.g. an empty result cached with string columns
+            mask = _mask(frame, agg.where)
+            inputs[f"a{i}"] = col.where(mask) if mask is not None else col
+        work = pd.DataFrame(inputs, index=frame.index)
+        depts = frame[dept_column].astype(str) if dept_column in frame else pd.Series("central", index=frame.index)
+        days = pd.to_datetime(frame[date_columns[fact]]).to_numpy().astype("datetime64[D]")
+        funcs = {f"a{i}": a.func for i, a in slots}
+        for period in periods:
+            start, end = period_bounds(period, today)
+            in_period = (days >= np.datetime64(start)) & (days <= np.datetime64(end))
+            sub = work[in_period]
+            by_dept = sub.groupby(depts[in_period]).agg(funcs).drop(index="central", errors="ignore")
+            total = sub.agg(funcs).to_frame("central").T
+            part = pd.concat([by_dept, total])
+            part.index = pd.MultiIndex.from_arrays([part.index.astype(str), [period] * len(part)],
+                                                   names=["dept", "period"])
+            parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=list(plan.exprs))
+    slots_table = pd.concat(parts, axis=1).T.groupby(level=0).first().T  # one column per slot
+    for i, a in enumerate(plan.aggregates):
+        col = f"a{i}"
+        if col not in slots_table:
+            slots_table[col] = np.nan
+        if a.func in _ADDITIVE:
+            slots_table[col] = slots_table[col].fillna(0.0)
+    slots_table = slots_table.astype(float)
+    out = pd.DataFrame({key: _eval(node, slots_table) for key, node in plan.exprs.items()}, index=slots_table.index)
+    return out.astype(float)
+
+def fact_for_dataset(dataset: str, specs: Optional[Dict[str, Any]] = None) -> str:
+    """Fact table of the rollup spec that owns a catalog dataset."""
+    for spec in (specs or {s.fact: s for s in ROLLUP_SPECS}).values():
+        if spec.dataset == dataset:
+            return spec.fact
+    raise FormulaError(f"no fact table configured for dataset {dataset}")
+
+def formula_columns(formula: str) -> List[str]:
+    """Unqualified column names in `formula`, in order of appearance."""
+    keywords = set(_FUNCS) | {"DISTINCT", "FILTER", "WHERE", "AND", "IN"}
+    names = [v for k, v in _tokenize(formula) if k == "name" and v.upper() not in keywords and "." not in v]
+    return list(dict.fromkeys(names))
+
+def formula_measures(formula: str, fact: str) -> List[str]:
+    """Columns `formula` aggregates on `fact` (not the ones its FILTER clauses test), in order."""
+    plan = compile_kpis({"kpi": (formula, fact)})
+    return list(dict.fromkeys(a.column for a in plan.aggregates if a.fact == fact and a.column))
+
+def fact_for_formula(formula: str, specs: Optional[Dict[str, Any]] = None) -> str:
+    """Fact table whose measures/dimensions cover every unqualified column in `formula` (for KpiDef)."""
+    specs = specs or {s.fact: s for s in ROLLUP_SPECS}
+    names = set(formula_columns(formula))
+    for spec in specs.values():
+        known = set(spec.measures) | set(spec.dimensions) | {spec.date_column}
+        if names and names <= known:
+            return spec.fact
+    raise FormulaError(f"cannot tell which fact table {formula!r} reads")
+
+def kpi_frames(plan: KpiPlan, dsn: str, specs: Dict[str, Any], periods: Sequence[str],
+               dept_column: str = "dept", today: Optional[date] = None) -> Dict[str, pd.DataFrame]:
+    """Just the columns the plan needs, for the union of `periods`, through the warehouse Parquet cache."""
+    from .warehouse import warehouse_query
+
+    bounds = [period_bounds(p, today) for p in periods]
+    params = {"start_date": min(b[0] for b in bounds).isoformat(),
+              "end_date": (max(b[1] for b in bounds) + timedelta(days=1)).isoformat()}
+    frames = {}
+    for fact in plan.facts():
+        date_col = specs[fact].date_column
+        cols = [dept_column, date_col] + [c for c in plan.columns(fact) if c not in (dept_column, date_col)]
+        sql = (f"SELECT {', '.join(cols)} FROM {fact} "
+               f"WHERE {date_col} >= :start_date AND {date_col} < :end_date")
+        frames[fact] = warehouse_query(sql, params, dsn, "central", "central", ",".join(periods),
+                                       refresh_interval_s(specs[fact].dataset))
+    return frames
+
+def measure_formulas(cfg: Dict[str, Any]) -> Dict[str, Tuple[str, str]]:
+    """{KPI key: (formula, fact)} for the Power BI measure registry, from MEASURE_FORMULAS with KPI_FORMULAS overrides."""
+    from .mock import MEASURE_FORMULAS
+    from .powerbi import POWERBI_MEASURES
+
+    specs = rollup_specs(cfg)
+    formulas = dict(MEASURE_FORMULAS, **(cfg.get("KPI_FORMULAS") or json_secret("KPI_FORMULAS", {}) or {}))
+    return {m.key: (formulas[m.key], fact_for_dataset(m.dataset, specs))
+            for m in POWERBI_MEASURES if formulas.get(m.key)}
+
+def local_kpi_table(period: str, dsn: str, cfg: Dict[str, Any]) -> Tuple[pd.DataFrame, float]:
+    """Every measure KPI for every department in `period`, computed from the warehouse; (table, computed_at)."""
+    formulas = measure_formulas(cfg)
+    plan = compile_kpis(formulas)
+    specs = rollup_specs(cfg)
+    dept_column = cfg.get("KPI_DEPT_COLUMN") or secret("KPI_DEPT_COLUMN", "dept")
+    ttl = min([refresh_interval_s(specs[f].dataset) for f in plan.facts()] or [300.0])
+    digest = fingerprint(dsn)
+    key = ("kpi_local", "central", "central", period,
+           json.dumps({"dsn": digest, "formulas": formulas, "dept_column": dept_column}, sort_keys=True))
+
+    def compute() -> pd.DataFrame:
+        frames = kpi_frames(plan, dsn, specs, [period], dept_column)
+        with metrics().timed("kpi_local_eval"):
+            return evaluate_plan(plan, frames, {f: specs[f].date_column for f in plan.facts()}, [period], dept_column)
+
+    return result_cache().get_or_revalidate(key, ttl, compute)
+
+def local_kpis(period: str, scope: str, dept: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Same shape as `powerbi_kpis`, computed locally from the warehouse (the Power BI fallback)."""
+    cfg = get_dept_config(scope, dept)
+    dsn = cfg.get("WAREHOUSE_DSN") or secret("WAREHOUSE_DSN")
+    if not dsn:
+        raise RuntimeError("Missing WAREHOUSE_DSN.")
+    t0 = time.time()
+    table, computed_at = local_kpi_table(period, dsn, cfg)
+    row_key = (dept if scope == "department" else "central", period)
+    if row_key not in table.index:
+        values = {k: 0.0 for k in table.columns}  # no rows for this department in the period
+    else:
+        values = {k: float(v) for k, v in table.loc[row_key].items() if pd.notna(v)}
+    return values, {k: min(computed_at, t0) for k in values}
@@ -0,0 +1,37 @@
+"""Per-dataset refresh intervals and staleness labels derived from catalog SLAs."""
+import time
+from typing import Dict, Optional, Tuple
+
+from .formatting import format_age
+from .mock import MOCK_DATASETS
+
+# Fallback for datasets the synced DataHub catalog does not declare an SLA for
+MOCK_SLAS: Dict[str, Tuple[int, str]] = {d.id: (d.freshnessSlaHours, d.updateCadence) for d in MOCK_DATASETS}
+
+CADENCE_HOURS = {"Daily": 24, "Weekly": 168, "Monthly": 720, "Per event": 24}
+
+def dataset_sla(dataset_id: str) -> Optional[Tuple[int, str]]:
+    """(freshness SLA hours, update cadence) from the synced catalog, else the mock catalog, else None."""
+    from .datahub import synced_slas  # datahub pulls in the HTTP client
+    return synced_slas().get(dataset_id) or MOCK_SLAS.get(dataset_id)
+
+def refresh_interval_s(dataset_id: str, default: float = 300) -> float:
+    """Revalidate at a quarter of the tighter of the freshness SLA and the update cadence.
+
+    Daily partnership KPIs refresh every 6h, Monthly UNFIP funding every 42h. Unknown
+    datasets fall back to `default`.
+    """
+    sla = dataset_sla(dataset_id)
+    if sla is None:
+        return default
+    sla_hours, cadence = sla
+    hours = min(sla_hours, CADENCE_HOURS.get(cadence, sla_hours))
+    return max(default, hours * 3600 / 4)
+
+def staleness_label(fetched_at: float, dataset_id: str) -> str:
+    """🟢 within the refresh interval, 🟡 past it but inside the SLA (revalidating), 🔴 past the SLA."""
+    age = time.time() - fetched_at
+    declared = dataset_sla(dataset_id)
+    sla = declared[0] * 3600 if declared else float("inf")
+    icon = "🟢" if age < refresh_interval_s(dataset_id) else ("🟡" if age < sla else "🔴")
+    return f"{icon} updated {format_age(age)} ago"
@@ -0,0 +1,71 @@
+"""Concurrent, deadline-bounded loading of independent live sources."""
+import contextvars
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Tuple
+
+from .metrics import metrics
+
+# Per-source deadlines (seconds); "Warehouse/trend" falls back to "Warehouse"
+SOURCE_DEADLINES_S = {"DataHub": 15.0, "Power BI": 20.0, "Warehouse": 20.0, "KPI engine": 20.0, "Quality": 30.0}
+
+def fan_out(tasks: Dict[str, Callable[[], Any]], deadlines_s: Dict[str, float], page_deadline_s: float,
+            max_workers: int = 8) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, float]]:
+    """Run independent source loaders concurrently on a bounded pool.
+
+    Returns (results, errors, elapsed seconds) keyed by task name. A task that misses its own
+    deadline or the page deadline is reported as an error and left to finish in the background,
+    so a late result still lands in the cache for the next rerun.
+    """
+    ctx = add_script_run_ctx = None
+    if "streamlit" in sys.modules:  # let loaders running under the app keep their session context
+        try:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+            ctx = get_script_run_ctx()
+        except Exception:
+            pass
+
+    def run(fn: Callable[[], Any]) -> Any:
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    elapsed: Dict[str, float] = {}
+    if not tasks:
+        return results, errors, elapsed
+
+    ex = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))), thread_name_prefix="live-source")
+    started = time.monotonic()
+    futures = {ex.submit(contextvars.copy_context().run, run, fn): name for name, fn in tasks.items()}
+    budget = {f: min(deadlines_s.get(name, deadlines_s.get(name.split("/")[0], page_deadline_s)), page_deadline_s)
+              for f, name in futures.items()}
+    pending = set(futures)
+    try:
+        while pending:
+            timeout = max(0.0, min(started + budget[f] for f in pending) - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for f in done:
+                name = futures[f]
+                elapsed[name] = now - started
+                metrics().observe("latency_seconds", elapsed[name], op="live_source", source=name)
+                try:
+                    results[name] = f.result()
+                except Exception as e:
+                    errors[name] = str(e)
+                    metrics().inc("errors_total", op="live_source", source=name, error=type(e).__name__)
+            pending -= done
+            for f in [f for f in pending if started + budget[f] <= now]:
+                name = futures[f]
+                elapsed[name] = now - started
+                errors[name] = f"timed out after {budget[f]:g}s"
+                metrics().inc("errors_total", op="live_source", source=name, error="timeout")
+                f.cancel()
+                pending.discard(f)
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    return results, errors, elapsed
@@ -0,0 +1,154 @@
+"""Latency/size histograms and counters for the live integrations, in Prometheus text format."""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import singleton
+
+def _prom_escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metrics:
+    """Process-wide counters and histograms for the live integrations.
+
+    Every series carries the caller's labels merged over the ambient `tags` of the page run
+    (department, period). Worker threads start from a copy of the caller's context, so a DAX
+    query issued from a fan-out thread is still attributed to the page that asked for it.
+    Exported in Prometheus text format.
+    """
+
+    LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    SIZE_BUCKETS_B = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+
+    def __init__(self, prefix: str = "unportal"):
+        self.prefix = prefix
+        self.tags: "contextvars.ContextVar[Dict[str, str]]" = contextvars.ContextVar("metric_tags", default={})
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._hists: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[Any]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+
+    def _labels(self, labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        merged = dict(self.tags.get())
+        merged.update({k: str(v) for k, v in labels.items() if v is not None})
+        return tuple(sorted(merged.items()))
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS_S, **labels) -> None:
+        key = (name, self._labels(labels))
+        with self._lock:
+            buckets = self._buckets.setdefault(name, buckets)
+            hist = self._hists.get(key)
+            if hist is None:
+                hist = self._hists[key] = [[0] * len(buckets), 0.0, 0]  # per-bucket counts, sum, count
+            i = bisect.bisect_left(buckets, value)
+            if i < len(buckets):
+                hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    @contextmanager
+    def timed(self, op: str, **labels):
+        """Record the block's duration under `latency_seconds{op=...}`; exceptions also count as errors."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.inc("errors_total", op=op, error=type(e).__name__, **labels)
+            raise
+        finally:
+            self.observe("latency_seconds", time.perf_counter() - t0, op=op, **labels)
+
+    def payload(self, op: str, size: int, **labels) -> None:
+        self.observe("payload_bytes", float(size), buckets=self.SIZE_BUCKETS_B, op=op, **labels)
+
+    @staticmethod
+    def _quantile(buckets: Tuple[float, ...], counts: List[int], total: int, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation
+        rank, seen, lower = q * total, 0, 0.0
+        for bound, c in zip(buckets, counts):
+            if c and seen + c >= rank:
+                return lower + (bound - lower) * (rank - seen) / c
+            seen, lower = seen + c, bound
+        return buckets[-1]
+
+    def histograms(self, name: str) -> List[Dict[str, Any]]:
+        """One row per `name` series: its labels plus count, sum, mean, p50 and p95."""
+        with self._lock:
+            buckets = self._buckets.get(name, ())
+            items = [(dict(labels), list(h[0]), h[1], h[2]) for (n, labels), h in self._hists.items() if n == name]
+        return [dict(labels, count=n, sum=total, mean=total / n if n else 0.0,
+                     p50=self._quantile(buckets, counts, n, 0.5), p95=self._quantile(buckets, counts, n, 0.95))
+                for labels, counts, total, n in items]
+
+    def counters(self, name: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(labels, value=v) for (n, labels), v in self._counters.items() if n == name]
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            hists = sorted((k, (list(h[0]), h[1], h[2])) for k, h in self._hists.items())
+            buckets = dict(self._buckets)
+
+        def fmt(labels, extra=()) -> str:
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{_prom_escape(v)}"' for k, v in items) + "}" if items else ""
+
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            full = f"{self.prefix}_{name}"
+            if full not in typed:
+                lines.append(f"# TYPE {full} counter")
+                typed.add(full)
+            lines.append(f"{full}{fmt(labels)} {value:g}")
+        for (name, labels), (counts, total, n) in hists:
+            full = f"{self.prefix}_{name}"
+            if full not in typed:
+                lines.append(f"# TYPE {full} histogram")
+                typed.add(full)
+            cumulative = 0
+            for bound, c in zip(buckets[name], counts):
+                cumulative += c
+                lines.append(f"{full}_bucket{fmt(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{full}_bucket{fmt(labels, [('le', '+Inf')])} {n}")
+            lines.append(f"{full}_sum{fmt(labels)} {total:g}")
+            lines.append(f"{full}_count{fmt(labels)} {n}")
+        return "\n".join(lines) + "\n"
+
+@singleton
+def metrics() -> Metrics:
+    return Metrics()
+
+@singleton
+def start_exporter(port: int) -> Optional[ThreadingHTTPServer]:
+    """Serve `/metrics` for Prometheus on `port` (once per process; None if the port is taken)."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics().prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    except OSError:
+        return None  # another app process already exports on this port
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-exporter").start()
+    return server
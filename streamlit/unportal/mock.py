@@ -0,0 +1,100 @@
+"""Offline catalog, KPI dictionary and report figures used by Mock mode and as live fallbacks."""
+from typing import List
+
+from .models import Dataset, KpiDef
+
+# Headline figures from the published reports; mock KPI values and chart data are derived from these
+REPORT_ANCHORS = {
+    "unfip_disbursed_usd": 23500000,
+    "unfip_grants_usd": 12700000,
+    "unfip_entities_usd": 10800000,
+    "unfip_projects_supported": 720,
+    "unfip_countries_participating": 138,
+    "sdg_goals_lounge_in_person": 2000,
+    "sdg_goals_lounge_remote": 500000,
+    "sdg_advocates_members": 17,
+    "sdg_advocates_social_reach": 23000000,
+    "women_rise_survey_respondents": 2300,
+    "women_rise_dialogue_participants": 300,
+}
+
+# Each KPI's formula over its warehouse fact table, written once: the Power BI measure registry
+# (local KPI engine) and the KPI Dictionary below are both built from these.
+MEASURE_FORMULAS = {
+    "totalDisbursedUsd": "SUM(disbursed_amount_usd)",
+    "projectsSupported": "COUNT(DISTINCT project_id)",
+    "countriesParticipating": "COUNT(DISTINCT country_id)",
+    "loungeInPerson": "SUM(in_person_attendees) FILTER (WHERE initiative = 'SDG Goals Lounge')",
+    "loungeRemote": "SUM(remote_viewers) FILTER (WHERE initiative = 'SDG Goals Lounge')",
+    "advocatesSocialReach": "SUM(social_reach) FILTER (WHERE initiative = 'SDG Advocates')",
+}
+
+MOCK_DATASETS: List[Dataset] = [
+    Dataset(
+        id="gold_unfip_funding",
+        name="UNFIP Funding & Disbursements (Gold)",
+        domain="Funding",
+        sensitivity="Internal",
+        certified=True,
+        owner="UNOP / UNFIP – Finance & Analytics",
+        updateCadence="Monthly",
+        freshnessSlaHours=168,
+        description="Curated disbursement facts and breakdowns (grants vs. UN system entities), with implementing partner and thematic tags.",
+        tables=["fact_unfip_disbursements","dim_implementing_partner","dim_theme","dim_country","dim_date"],
+        tags=["Funding","Donor","Gold","Certified"],
+        dept="unfip",
+    ),
+    Dataset(
+        id="gold_initiative_engagement",
+        name="Initiatives & Engagement Metrics (Gold)",
+        domain="Engagement",
+        sensitivity="Internal",
+        certified=True,
+        owner="UNOP – Partnerships & Comms Analytics",
+        updateCadence="Weekly",
+        freshnessSlaHours=72,
+        description="Engagement KPIs for flagship initiatives (SDG Goals Lounge, Women Rise for All, convenings) with reach and participation.",
+        tables=["fact_initiative_events","dim_initiative","dim_location","dim_date"],
+        tags=["Events","Reach","KPI","Gold"],
+        dept="central",
+    ),
+    Dataset(
+        id="gold_partnership_kpis",
+        name="Partnership KPIs (Gold)",
+        domain="Partnerships",
+        sensitivity="Internal",
+        certified=True,
+        owner="Office for Partnerships – Ops Analytics",
+        updateCadence="Daily",
+        freshnessSlaHours=24,
+        description="KPI fact table for partnership pipeline/performance: targets, achievements, engagement metrics.",
+        tables=["fact_partnership_kpis","dim_partner","dim_program","dim_date"],
+        tags=["KPI","M&E","Donor","Gold"],
+        dept="partnerships",
+    ),
+]
+
+MOCK_KPIS: List[KpiDef] = [
+    KpiDef(
+        id="kpi_unfip_total_disbursed",
+        name="UNFIP Total Disbursed (USD)",
+        domain="Funding",
+        description="Total UNFIP disbursements in the selected period.",
+        formula=MEASURE_FORMULAS["totalDisbursedUsd"],
+        owner="Finance & Analytics",
+        cadence="Monthly",
+        qualityChecks=["No negative disbursements","FX normalization applied","Partner IDs valid"],
+        dept="unfip",
+    ),
+    KpiDef(
+        id="kpi_lounge_total_reach",
+        name="SDG Goals Lounge Reach",
+        domain="Engagement",
+        description="In-person participants + remote participants for SDG Goals Lounge programming.",
+        formula=f"{MEASURE_FORMULAS['loungeInPerson']} + {MEASURE_FORMULAS['loungeRemote']}",
+        owner="Partnerships & Comms Analytics",
+        cadence="Per event",
+        qualityChecks=["Event IDs unique","No null attendance values"],
+        dept="central",
+    ),
+]
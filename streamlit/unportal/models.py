@@ -0,0 +1,30 @@
+"""Catalog and KPI dictionary records, shaped like the React UI's Dataset / KPI objects."""
+from dataclasses import dataclass
+from typing import List
+
+@dataclass
+class Dataset:
+    id: str
+    name: str
+    domain: str
+    sensitivity: str
+    certified: bool
+    owner: str
+    updateCadence: str
+    freshnessSlaHours: int
+    description: str
+    tables: List[str]
+    tags: List[str]
+    dept: str
+
+@dataclass
+class KpiDef:
+    id: str
+    name: str
+    domain: str
+    description: str
+    formula: str
+    owner: str
+    cadence: str
+    qualityChecks: List[str]
+    dept: str
@@ -0,0 +1,292 @@
+"""Power BI adapter: measure registry, service-principal tokens and batched DAX queries.
+
+`msal` is imported on the first token request, not at import time.
+"""
+import functools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .cache import INVALIDATED, result_cache, single_flight
+from .config import get_dept_config, json_secret, optional_import, secret, singleton
+from .freshness import refresh_interval_s
+from .metrics import metrics
+from .mock import REPORT_ANCHORS
+from .resilience import RetryableError, guarded_call, http_error
+
+@dataclass
+class PbiMeasure:
+    key: str
+    measure: str
+    mock: float
+    dataset: str
+
+# Power BI measure registry: one entry per KPI, all fetched in a single executeQueries call.
+# `dataset` names the catalog data product whose freshness SLA sets the KPI's refresh interval.
+# The local KPI engine recomputes each KPI from MEASURE_FORMULAS (unportal.mock) when Power BI is unavailable.
+# Replace the measure names with your exact Power BI measures (or override per department via PBI_MEASURES).
+POWERBI_MEASURES: List[PbiMeasure] = [
+    PbiMeasure("totalDisbursedUsd", "Total Disbursed USD", REPORT_ANCHORS["unfip_disbursed_usd"], "gold_unfip_funding"),
+    PbiMeasure("projectsSupported", "Projects Supported", REPORT_ANCHORS["unfip_projects_supported"], "gold_unfip_funding"),
+    PbiMeasure("countriesParticipating", "Countries Participating", REPORT_ANCHORS["unfip_countries_participating"], "gold_unfip_funding"),
+    PbiMeasure("loungeInPerson", "SDG Lounge In-Person", REPORT_ANCHORS["sdg_goals_lounge_in_person"], "gold_initiative_engagement"),
+    PbiMeasure("loungeRemote", "SDG Lounge Remote", REPORT_ANCHORS["sdg_goals_lounge_remote"], "gold_initiative_engagement"),
+    PbiMeasure("advocatesSocialReach", "SDG Advocates Social Reach", REPORT_ANCHORS["sdg_advocates_social_reach"], "gold_initiative_engagement"),
+]
+
+PBI_SCOPES = ["https://analysis.windows.net/powerbi/api/.default"]
+PBI_DEFAULT_AUTHORITY_HOST = "https://login.microsoftonline.com"
+PBI_DEFAULT_API_BASE = "https://api.powerbi.com"
+# OAuth error codes AAD answers with during outages and throttling (MSAL returns them, it does not raise)
+AAD_TRANSIENT_ERRORS = ("temporarily_unavailable", "server_error", "service_unavailable", "slow_down")
+
+class PowerBITokenProvider:
+    """Process-wide client-credentials token cache shared by every Streamlit session.
+
+    One MSAL app per (tenant, client); tokens are reused until `refresh_margin_s` before
+    expiry and re-acquired by a background timer so callers rarely wait on AAD.
+    """
+
+    def __init__(self, refresh_margin_s: int = 300, authority_host: str = PBI_DEFAULT_AUTHORITY_HOST):
+        self.refresh_margin_s = refresh_margin_s
+        self.authority_host = authority_host.rstrip("/")
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._apps: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+        self._tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._timers: Dict[Tuple[str, str], threading.Timer] = {}
+        self._stats = {"hits": 0, "misses": 0, "background_refreshes": 0, "errors": 0,
+                       "acquisitions": 0, "acquire_ms_total": 0.0, "acquire_ms_max": 0.0}
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[str]:
+        tok = self._tokens.get(key)
+        if tok and tok[1] - self.refresh_margin_s > time.time():
+            return tok[0]
+        return None
+
+    def get_token(self, tenant: str, client_id: str, client_secret: str) -> str:
+        key = (tenant, client_id)
+        with self._lock:
+            tok = self._cached(key)
+            if tok:
+                self._stats["hits"] += 1
+                metrics().inc("cache_requests_total", cache="powerbi_token", result="hit")
+                return tok
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent sessions queue on the per-client lock; only the first one hits AAD
+        with key_lock:
+            with self._lock:
+                tok = self._cached(key)
+                self._stats["hits" if tok else "misses"] += 1
+            metrics().inc("cache_requests_total", cache="powerbi_token", result="hit" if tok else "miss")
+            return tok or self._acquire(key, client_secret, force=False)
+
+    def _app(self, key: Tuple[str, str], client_secret: str):
+        with self._lock:
+            cached = self._apps.get(key)
+            if cached and cached[0] == client_secret:
+                return cached[1]
+        msal = optional_import("msal")
+        app = msal.ConfidentialClientApplication(
+            key[1], authority=f"{self.authority_host}/{key[0]}",
+            client_credential=client_secret, token_cache=msal.TokenCache(),
+            # Sovereign clouds / test stubs are not in MSAL's known-host list
+            validate_authority=self.authority_host == PBI_DEFAULT_AUTHORITY_HOST,
+        )
+        with self._lock:
+            self._apps[key] = (client_secret, app)
+        return app
+
+    def _acquire(self, key: Tuple[str, str], client_secret: str, force: bool) -> str:
+        app = self._app(key, client_secret)
+        if force and hasattr(app, "remove_tokens_for_client"):
+            app.remove_tokens_for_client()  # otherwise MSAL hands back its own cached token
+        t0 = time.perf_counter()
+        try:
+            res = app.acquire_token_for_client(scopes=PBI_SCOPES)
+        finally:
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                self._stats["acquisitions"] += 1
+                self._stats["acquire_ms_total"] += elapsed_ms
+                self._stats["acquire_ms_max"] = max(self._stats["acquire_ms_max"], elapsed_ms)
+        if "access_token" not in res:
+            with self._lock:
+                self._stats["errors"] += 1
+            message = f"Token failure: {res.get('error_description', str(res))}"
+            if res.get("error") in AAD_TRANSIENT_ERRORS:
+                raise RetryableError(message)
+            raise RuntimeError(message)
+        expires_at = time.time() + float(res.get("expires_in", 3600))
+        with self._lock:
+            self._tokens[key] = (res["access_token"], expires_at)
+        self._schedule_refresh(key, client_secret, expires_at)
+        return res["access_token"]
+
+    def _schedule_refresh(self, key: Tuple[str, str], client_secret: str, expires_at: float) -> None:
+        # Refresh a little before the foreground cutoff, with jitter so tenants don't sync up
+        delay = expires_at - self.refresh_margin_s - time.time() - random.uniform(30, 90)
+        if delay < 30:
+            return
+        timer = threading.Timer(delay, self._background_refresh, args=(key, client_secret))
+        timer.daemon = True
+        with self._lock:
+            old = self._timers.pop(key, None)
+            self._timers[key] = timer
+        if old:
+            old.cancel()
+        timer.start()
+
+    def _background_refresh(self, key: Tuple[str, str], client_secret: str) -> None:
+        try:
+            with self._key_locks[key]:
+                self._acquire(key, client_secret, force=True)
+            with self._lock:
+                self._stats["background_refreshes"] += 1
+        except Exception:
+            # Keep serving the current token; the next foreground miss retries
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._stats)
+            s["cached_tokens"] = len(self._tokens)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = (s["hits"] / lookups) if lookups else 0.0
+        s["acquire_ms_avg"] = (s["acquire_ms_total"] / s["acquisitions"]) if s["acquisitions"] else 0.0
+        return s
+
+@singleton
+def token_provider(authority_host: str = PBI_DEFAULT_AUTHORITY_HOST) -> PowerBITokenProvider:
+    return PowerBITokenProvider(authority_host=authority_host)
+
+def _powerbi_access_token() -> str:
+    tenant = secret("PBI_TENANT_ID")
+    client_id = secret("PBI_CLIENT_ID")
+    client_secret = secret("PBI_CLIENT_SECRET")
+    if not tenant or not client_id or not client_secret:
+        raise RuntimeError("Missing Power BI creds (PBI_TENANT_ID / PBI_CLIENT_ID / PBI_CLIENT_SECRET).")
+    if optional_import("msal") is None:
+        raise RuntimeError("Missing dependency: msal")
+    provider = token_provider(secret("PBI_AUTHORITY_HOST", PBI_DEFAULT_AUTHORITY_HOST))
+
+    def acquire(_timeout_s: float) -> str:  # MSAL applies its own HTTP timeouts
+        with metrics().timed("powerbi_token"):
+            return provider.get_token(tenant, client_id, client_secret)
+
+    return guarded_call("powerbi_token", tenant, acquire)
+
+def _powerbi_execute_dax(group_id: str, dataset_id: str, dax: str) -> Dict[str, Any]:
+    token = _powerbi_access_token()
+    api_base = secret("PBI_API_BASE", PBI_DEFAULT_API_BASE).rstrip("/")
+    url = f"{api_base}/v1.0/myorg/groups/{group_id}/datasets/{dataset_id}/executeQueries"
+    body = {"queries":[{"query": dax}], "serializerSettings":{"includeNulls": True}}
+
+    def post(timeout_s: float) -> requests.Response:
+        with metrics().timed("powerbi_dax"):
+            r = requests.post(url, headers={"Authorization": f"Bearer {token}", "Content-Type":"application/json"},
+                              data=json.dumps(body), timeout=timeout_s)
+        metrics().payload("powerbi_dax", len(r.content))
+        if r.status_code >= 300:
+            metrics().inc("errors_total", op="powerbi_dax", error=f"http_{r.status_code}")
+            raise http_error("executeQueries", r)
+        return r
+
+    return guarded_call("powerbi_dax", f"{group_id}/{dataset_id}", post).json()
+
+def _extract_row_number(exec_res: Dict[str, Any], col: str) -> float:
+    row = (((exec_res.get("results") or [{}])[0].get("tables") or [{}])[0].get("rows") or [{}])[0]
+    # executeQueries returns ROW() columns as "[name]"; accept both spellings
+    val = row.get(f"[{col}]", row.get(col, 0))
+    try:
+        return float(val or 0)
+    except Exception:
+        return 0.0
+
+def _powerbi_measures(cfg: Dict[str, Any]) -> List[PbiMeasure]:
+    overrides = cfg.get("PBI_MEASURES") or json_secret("PBI_MEASURES", {}) or {}
+    return [replace(m, measure=overrides.get(m.key, m.measure)) for m in POWERBI_MEASURES]
+
+def _dax_row_query(measures: List[PbiMeasure]) -> str:
+    cols = ", ".join('"{}", [{}]'.format(m.key.replace('"', '""'), m.measure.replace("]", "]]")) for m in measures)
+    return f"EVALUATE ROW({cols})"
+
+def _powerbi_fetch(group_id: str, dataset_id: str, measures: List[PbiMeasure], batch_size: int) -> Dict[str, float]:
+    # One EVALUATE ROW(...) per batch; by default every measure goes in a single round-trip
+    batch_size = max(1, batch_size or len(measures))
+    out: Dict[str, float] = {}
+    for i in range(0, len(measures), batch_size):
+        batch = measures[i:i + batch_size]
+        res = _powerbi_execute_dax(group_id, dataset_id, _dax_row_query(batch))
+        for m in batch:
+            out[m.key] = _extract_row_number(res, m.key)
+    return out
+
+def powerbi_kpis(period: str, scope: str, dept: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """KPI values and the time each was fetched.
+
+    Measures are cached per source dataset and served stale-while-revalidate on that
+    dataset's refresh interval. Groups with nothing cached yet are fetched together in one
+    blocking query; expired groups are returned as-is and reloaded in the background.
+    """
+    cfg = get_dept_config(scope, dept)
+    group_id = cfg.get("PBI_GROUP_ID") or secret("PBI_GROUP_ID")
+    dataset_id = cfg.get("PBI_DATASET_ID") or secret("PBI_DATASET_ID")
+    if not group_id or not dataset_id:
+        raise RuntimeError("Missing Power BI IDs (PBI_GROUP_ID / PBI_DATASET_ID).")
+    batch_size = int(cfg.get("PBI_MAX_MEASURES_PER_QUERY") or secret("PBI_MAX_MEASURES_PER_QUERY", "0") or 0)
+
+    groups: Dict[str, List[PbiMeasure]] = {}
+    for m in _powerbi_measures(cfg):
+        groups.setdefault(m.dataset, []).append(m)
+    cache = result_cache()
+    keys = {ds: ("powerbi", scope, dept, period, json.dumps({"dataset": ds, "measures": [[m.key, m.measure] for m in ms]}))
+            for ds, ms in groups.items()}
+
+    values: Dict[str, float] = {}
+    fetched_at: Dict[str, float] = {}
+    missing: List[str] = []
+    last_good: Dict[str, Tuple[Dict[str, float], float]] = {}
+    for ds, key in keys.items():
+        ttl = refresh_interval_s(ds)
+        entry = cache.get_entry(key, allow_expired=True)
+        if entry is None or entry[2] == INVALIDATED:
+            missing.append(ds)
+            if entry is not None:
+                last_good[ds] = (entry[0], entry[1])
+            continue
+        group_vals, stored_at, expires_at = entry
+        if expires_at <= time.time():
+            cache.revalidate_async(key, ttl, functools.partial(_powerbi_fetch, group_id, dataset_id, groups[ds], batch_size))
+        values.update(group_vals)
+        fetched_at.update({k: stored_at for k in group_vals})
+
+    if missing:
+        def fetch_missing() -> Tuple[Dict[str, float], float]:
+            fresh = _powerbi_fetch(group_id, dataset_id, [m for ds in missing for m in groups[ds]], batch_size)
+            for ds in missing:
+                cache.put(keys[ds], {m.key: fresh[m.key] for m in groups[ds]}, refresh_interval_s(ds))
+            return fresh, time.time()
+
+        try:
+            # sessions missing the same measures at once share one executeQueries call
+            fresh, now = single_flight().do(("powerbi", scope, dept, period, json.dumps([keys[ds][4] for ds in missing])),
+                                            fetch_missing)
+        except Exception:
+            if any(ds not in last_good for ds in missing):
+                raise
+            for ds in missing:  # invalidated but Power BI is down: keep the last known good values
+                group_vals, stored_at = cache.last_good(keys[ds], (*last_good[ds], INVALIDATED))
+                values.update(group_vals)
+                fetched_at.update({k: stored_at for k in group_vals})
+            return values, fetched_at
+        for ds in missing:
+            group_vals = {m.key: fresh[m.key] for m in groups[ds]}
+            values.update(group_vals)
+            fetched_at.update({k: now for k in group_vals})
+    return values, fetched_at
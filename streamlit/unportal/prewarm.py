@@ -0,0 +1,162 @@
+"""Pre-warm the shared caches for every department × period before users arrive.
+
+    python -m unportal.prewarm                       # all departments and periods
+    python -m unportal.prewarm --depts unfip gender --periods y2025 --workers 2
+
+Runs the same loaders as the app (catalog, Power BI KPIs, local KPI engine, warehouse charts,
+quality checks) with each department's own config, so results land under the keys the app
+reads first. Where rollups are enabled, every configured rollup is refreshed, once per DSN. Run it from the folder the app runs in (or point RESULT_CACHE_PATH,
+WAREHOUSE_CACHE_DIR, CATALOG_DB_PATH and ROLLUP_DB_PATH at the same files). Anything that
+is due is refreshed in place. Calls are bounded by --workers and by per-source rate limits
+(PREWARM_RATE_LIMITS_JSON, calls per second). Sources that are not configured are skipped.
+Exits non-zero if any call failed.
+"""
+import argparse
+import contextvars
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .cache import result_cache
+from .config import DEPARTMENTS, PERIODS, get_dept_config, inline_refresh, json_secret, resolve_scope, secret
+from .metrics import metrics
+
+# Calls per second per source; Power BI executeQueries is limited to 120 per minute per user
+PREWARM_RATE_LIMITS = {"DataHub": 2.0, "Power BI": 1.0, "Warehouse": 4.0, "KPI engine": 4.0, "Quality": 1.0,
+                       "Rollups": 1.0}
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+Job = Tuple[str, str, str, Callable[[], Any]]  # (source, dept, period, call)
+
+# Job sources whose results land in the result cache under the view's own (scope, dept), by cache source.
+# The KPI engine and quality checks are cached under ("central", "central") for every view, so they prove nothing.
+VIEW_CACHED_SOURCES = {"Power BI": "powerbi", "Warehouse": "warehouse"}
+
+def view_scope(dept: str) -> Tuple[str, str]:
+    """(scope, dept) the app keys a view of `dept` under: "central" is the app's central mode."""
+    return resolve_scope("central" if dept == "central" else "department", dept)
+
+def prewarm_jobs(depts: List[str], periods: List[str]) -> List[Job]:
+    """Every loader the app would call for each department × period ("" for period-independent ones)."""
+    from .datahub import catalog_datasets
+    from .formulas import local_kpis
+    from .mock import MOCK_KPIS
+    from .powerbi import powerbi_kpis
+    from .quality import kpi_quality
+    from .rollups import refresh_rollups, rollup_specs, rollups_enabled
+    from .warehouse import warehouse_chart_loaders
+
+    jobs: List[Job] = []
+    rollup_dsns = set()
+    for d in depts:
+        scope, dept = view_scope(d)
+        jobs.append(("DataHub", dept, "", lambda s=scope, d=dept: catalog_datasets(s, d, "*")))
+        jobs.append(("Quality", dept, "", lambda s=scope, d=dept: kpi_quality(MOCK_KPIS, s, d)))
+        cfg = get_dept_config(scope, dept)
+        dsn = cfg.get("WAREHOUSE_DSN") or secret("WAREHOUSE_DSN")
+        if rollups_enabled(cfg) and dsn not in rollup_dsns:  # rollups are shared by every department on a DSN
+            rollup_dsns.add(dsn)
+            jobs.append(("Rollups", dept, "", lambda dsn=dsn, cfg=cfg: refresh_rollups(dsn, rollup_specs(cfg))
+                         if dsn else _raise(RuntimeError("Missing WAREHOUSE_DSN."))))
+        for period in periods:
+            jobs.append(("Power BI", dept, period, lambda p=period, s=scope, d=dept: powerbi_kpis(p, s, d)))
+            jobs.append(("KPI engine", dept, period, lambda p=period, s=scope, d=dept: local_kpis(p, s, d)))
+            try:
+                loaders = warehouse_chart_loaders(period, scope, dept)
+            except Exception as e:
+                loaders = {"*": lambda e=e: _raise(e)}  # report it like any other failure
+            jobs.extend(("Warehouse", dept, f"{period}/{name}", fn) for name, fn in loaders.items())
+    return jobs
+
+def _raise(e: Exception) -> Any:
+    raise e
+
+def run_prewarm(jobs: List[Job], workers: int = 4, rate_limits: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Run `jobs` on a bounded pool with refreshes inline; one report row per job."""
+    limits = dict(PREWARM_RATE_LIMITS, **(rate_limits or {}))
+    limiters = {source: RateLimiter(limits.get(source, 0.0)) for source in {j[0] for j in jobs}}
+
+    def run(source: str, dept: str, period: str, call: Callable[[], Any]) -> Dict[str, Any]:
+        inline_refresh.set(True)
+        metrics().tags.set({"dept": dept, "period": period.split("/")[0]})
+        limiters[source].wait()
+        t0 = time.perf_counter()
+        row = {"source": source, "dept": dept, "period": period, "status": "ok", "detail": ""}
+        try:
+            with metrics().timed("prewarm", source=source):
+                call()
+        except Exception as e:
+            msg = str(e).splitlines()[0] if str(e) else type(e).__name__
+            row.update(status="skipped" if msg.startswith("Missing") else "error", detail=msg)
+        row["seconds"] = round(time.perf_counter() - t0, 3)
+        return row
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prewarm") as ex:
+        futures = [ex.submit(contextvars.copy_context().run, run, *job) for job in jobs]
+        for f in as_completed(futures):
+            rows.append(f.result())
+    return sorted(rows, key=lambda r: (r["dept"], r["period"], r["source"]))
+
+def unwarmed_views(rows: List[Dict[str, Any]]) -> List[str]:
+    """Departments whose view-cached jobs succeeded but left nothing under the app's key for that view."""
+    from .rollups import rollups_enabled
+
+    expected: Dict[str, set] = {}
+    for r in rows:
+        if r["source"] in VIEW_CACHED_SOURCES and r["status"] == "ok":
+            expected.setdefault(r["dept"], set()).add(VIEW_CACHED_SOURCES[r["source"]])
+    unwarmed = []
+    for d, sources in expected.items():
+        scope, dept = view_scope(d)
+        if rollups_enabled(get_dept_config(scope, dept)):
+            sources.discard("warehouse")  # charts are answered from the rollup store, not the result cache
+        if any(not result_cache().count(scope, dept, source) for source in sources):
+            unwarmed.append(d)
+    return sorted(unwarmed)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--depts", nargs="+", default=[d["id"] for d in DEPARTMENTS], metavar="DEPT")
+    p.add_argument("--periods", nargs="+", default=PERIODS, choices=PERIODS, metavar="PERIOD")
+    p.add_argument("--workers", type=int, default=int(secret("PREWARM_WORKERS", "4")))
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = p.parse_args(argv)
+
+    t0 = time.perf_counter()
+    rows = run_prewarm(prewarm_jobs(args.depts, args.periods), args.workers,
+                       json_secret("PREWARM_RATE_LIMITS_JSON", {}) or {})
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['dept']:<14} {r['period'] or '-':<22} {r['source']:<11} {r['status']:<8} "
+                  f"{r['seconds']:>7.2f}s  {r['detail']}")
+    counts = {s: sum(r["status"] == s for r in rows) for s in ("ok", "skipped", "error")}
+    print(f"prewarmed {len(rows)} calls in {time.perf_counter() - t0:.1f}s: "
+          + ", ".join(f"{n} {s}" for s, n in counts.items()), file=sys.stderr)
+    unwarmed = unwarmed_views(rows)
+    if unwarmed:
+        print(f"no cached results under the app's keys for: {', '.join(unwarmed)}", file=sys.stderr)
+    return 1 if counts["error"] or unwarmed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
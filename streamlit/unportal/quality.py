@@ -0,0 +1,235 @@
+"""Executable data-quality checks for the KPI Dictionary's `qualityChecks` rules.
+
+Rule text maps to a check by pattern: "No negative …" (non_negative) and "No null …" (not_null) apply
+to the columns of the KPI's formula, "<Thing> IDs unique" (unique) to `<thing>_id`, and "<Thing> IDs
+valid" (foreign_key) to `<thing>_id` against the `<thing>_id` of the owning dataset's `dim_*<thing>`
+table (`dim_<thing>` when the dataset lists none). Rules that match no pattern and have no
+QUALITY_CHECKS_JSON entry are reported as "manual".
+
+All checks on one fact table run in a single streamed pass over the columns they need, one chunk
+(WAREHOUSE_FETCH_ROWS) at a time. Uniqueness keeps 8 bytes of 64-bit hash per row, never the rows;
+foreign keys are probed against the sorted hash set of the dimension's keys. Results are cached per
+dataset version: the fact table's row count and date range plus the sum and non-null count of each
+rollup measure, so restated amounts invalidate them as well as new rows.
+"""
+import json
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import result_cache
+from .config import fingerprint, get_dept_config, json_secret, optional_import, secret
+from .formulas import FormulaError, fact_for_formula, formula_measures
+from .freshness import refresh_interval_s
+from .metrics import metrics
+from .mock import MOCK_DATASETS
+from .models import KpiDef
+from .rollups import rollup_specs
+
+QUALITY_RESULT_TTL_S = 7 * 86400  # results are keyed by dataset version, so this only bounds disk use
+
+@dataclass
+class QualityCheck:
+    rule: str
+    check: str  # non_negative | not_null | unique | foreign_key | manual
+    fact: str = ""
+    columns: List[str] = field(default_factory=list)
+    ref: str = ""  # "dim_table.column" for foreign_key
+
+@dataclass
+class CheckResult:
+    rule: str
+    check: str
+    status: str  # pass | fail | manual | error
+    rows: int = 0
+    failures: int = 0
+    elapsed_ms: float = 0.0
+    detail: str = ""
+
+_RULES = [
+    (re.compile(r"^no negative\b", re.I), "non_negative"),
+    (re.compile(r"^no (?:null|missing)\b", re.I), "not_null"),
+    (re.compile(r"^(?P<thing>[a-z ]+?) ids? (?:are )?unique$", re.I), "unique"),
+    (re.compile(r"^(?P<thing>[a-z ]+?) ids? (?:are )?valid$", re.I), "foreign_key"),
+]
+
+def _dimension(thing: str, fact: str, cfg: Dict[str, Any]) -> str:
+    """The dimension table for `<thing>_id` on `fact`: the owning dataset's `dim_<thing>` or `dim_…_<thing>`."""
+    spec = rollup_specs(cfg).get(fact)
+    tables = next((d.tables for d in MOCK_DATASETS if spec and d.id == spec.dataset), [])
+    dims = [t for t in tables if t == f"dim_{thing}" or (t.startswith("dim_") and t.endswith(f"_{thing}"))]
+    return dims[0] if dims else f"dim_{thing}"
+
+def compile_checks(kpi: KpiDef, cfg: Dict[str, Any]) -> List[QualityCheck]:
+    """Executable checks for a KPI's rules; QUALITY_CHECKS_JSON ({rule: {check, columns, ref, fact}}) overrides."""
+    overrides = cfg.get("QUALITY_CHECKS") or json_secret("QUALITY_CHECKS_JSON", {}) or {}
+    try:
+        fact = fact_for_formula(kpi.formula, rollup_specs(cfg))
+        measures = formula_measures(kpi.formula, fact)
+    except FormulaError:
+        fact, measures = "", []
+    out = []
+    for rule in kpi.qualityChecks:
+        if rule in overrides:
+            o = overrides[rule]
+            out.append(QualityCheck(rule, o["check"], o.get("fact", fact), list(o.get("columns", measures)), o.get("ref", "")))
+            continue
+        for pattern, check in _RULES:
+            m = pattern.match(rule.strip())
+            if not m or not fact:
+                continue
+            if check in ("non_negative", "not_null"):
+                out.append(QualityCheck(rule, check, fact, measures))
+            else:
+                thing = re.sub(r"s$", "", m.group("thing").strip().lower()).replace(" ", "_")
+                ref = f"{_dimension(thing, fact, cfg)}.{thing}_id" if check == "foreign_key" else ""
+                out.append(QualityCheck(rule, check, fact, [f"{thing}_id"], ref))
+            break
+        else:
+            out.append(QualityCheck(rule, "manual"))
+    return out
+
+def _hash(values: pd.Series) -> np.ndarray:
+    """64-bit hashes that agree across chunks and tables (ints, floats and numeric strings alike)."""
+    values = values.dropna()
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.astype("float64")
+    else:
+        values = values.astype(str)
+    return pd.util.hash_array(values.to_numpy(), categorize=False)
+
+class _Scan:
+    """Running state of one check across chunks."""
+
+    def __init__(self, check: QualityCheck, ref_keys: Optional[np.ndarray] = None):
+        self.check, self.ref_keys = check, ref_keys
+        self.rows = self.failures = 0
+        self.seconds = 0.0
+        self.hashes: List[np.ndarray] = []
+
+    def feed(self, chunk: pd.DataFrame) -> None:
+        t0 = time.perf_counter()
+        cols = chunk[self.check.columns]
+        self.rows += len(chunk)
+        if self.check.check == "non_negative":
+            self.failures += int((cols.apply(pd.to_numeric, errors="coerce") < 0).any(axis=1).sum())
+        elif self.check.check == "not_null":
+            self.failures += int(cols.isna().any(axis=1).sum())
+        elif self.check.check == "unique":
+            self.hashes.append(_hash(cols.iloc[:, 0]))
+        elif self.check.check == "foreign_key":
+            h = _hash(cols.iloc[:, 0])
+            pos = np.minimum(np.searchsorted(self.ref_keys, h), max(len(self.ref_keys) - 1, 0))
+            found = self.ref_keys[pos] == h if len(self.ref_keys) else np.zeros(len(h), dtype=bool)
+            self.failures += int((~found).sum())
+        self.seconds += time.perf_counter() - t0
+
+    def result(self) -> CheckResult:
+        t0 = time.perf_counter()
+        detail = ""
+        if self.check.check == "unique":
+            h = np.sort(np.concatenate(self.hashes)) if self.hashes else np.empty(0, dtype=np.uint64)
+            self.failures = int((h[1:] == h[:-1]).sum())  # rows repeating an earlier key
+            detail = "duplicate rows"
+        elif self.check.check == "foreign_key":
+            detail = f"keys missing from {self.check.ref}"
+        elif self.check.check == "non_negative":
+            detail = "rows with a negative value"
+        elif self.check.check == "not_null":
+            detail = "rows with a null"
+        self.seconds += time.perf_counter() - t0
+        metrics().observe("latency_seconds", self.seconds, op="quality_check", check=self.check.check)
+        return CheckResult(self.check.rule, self.check.check, "fail" if self.failures else "pass",
+                           self.rows, self.failures, self.seconds * 1000, detail)
+
+def _stream(conn, sql: str, chunk_rows: int):
+    sa = optional_import("sqlalchemy")
+    result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(sa.text(sql))
+    columns = list(result.keys())
+    for part in result.partitions(chunk_rows):
+        yield pd.DataFrame.from_records(part, columns=columns)
+
+def _ref_keys(conn, ref: str, chunk_rows: int) -> np.ndarray:
+    table, column = ref.rsplit(".", 1)
+    parts = [_hash(chunk[column]) for chunk in _stream(conn, f"SELECT {column} FROM {table}", chunk_rows)]
+    return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.uint64)
+
+def run_checks(conn, fact: str, checks: List[QualityCheck], chunk_rows: int) -> List[CheckResult]:
+    """Run every check on `fact` in one chunked pass; a check that cannot run is reported as an error."""
+    scans: Dict[int, _Scan] = {}
+    results: Dict[int, CheckResult] = {}
+    sa = optional_import("sqlalchemy")
+    available = set(conn.execute(sa.text(f"SELECT * FROM {fact} WHERE 1 = 0")).keys())
+    for i, c in enumerate(checks):
+        missing = [col for col in c.columns if col not in available]
+        if missing:
+            results[i] = CheckResult(c.rule, c.check, "error", detail=f"no column {', '.join(missing)} in {fact}")
+            continue
+        try:
+            scans[i] = _Scan(c, _ref_keys(conn, c.ref, chunk_rows) if c.check == "foreign_key" else None)
+        except Exception as e:
+            results[i] = CheckResult(c.rule, c.check, "error", detail=str(e).splitlines()[0])
+    columns = sorted({col for s in scans.values() for col in s.check.columns})
+    if scans:
+        with metrics().timed("quality_scan", fact=fact):
+            try:
+                for chunk in _stream(conn, f"SELECT {', '.join(columns)} FROM {fact}", chunk_rows):
+                    for s in scans.values():
+                        s.feed(chunk)
+                results.update({i: s.result() for i, s in scans.items()})
+            except Exception as e:
+                results.update({i: CheckResult(s.check.rule, s.check.check, "error", detail=str(e).splitlines()[0])
+                                for i, s in scans.items()})
+    return [results[i] for i in range(len(checks))]
+
+def _dataset_version(conn, fact: str, date_column: str, measures: List[str]) -> List[Any]:
+    """Row count, date range and per-measure sum/non-null count: changes on appends and in-place restatements."""
+    sa = optional_import("sqlalchemy")
+    aggs = [f"SUM({m}), COUNT({m})" for m in measures]
+    row = conn.execute(sa.text(f"SELECT {', '.join(['COUNT(*)', f'MIN({date_column})', f'MAX({date_column})'] + aggs)} "
+                               f"FROM {fact}")).fetchone()
+    return [str(v) for v in row]
+
+def kpi_quality(kpis: List[KpiDef], scope: str, dept: str) -> Dict[str, List[CheckResult]]:
+    """Check results per KPI id, computed once per fact table and dataset version."""
+    from .warehouse import with_warehouse  # warehouse pulls in SQLAlchemy helpers
+
+    cfg = get_dept_config(scope, dept)
+    dsn = cfg.get("WAREHOUSE_DSN") or secret("WAREHOUSE_DSN")
+    if not dsn:
+        raise RuntimeError("Missing WAREHOUSE_DSN.")
+    specs = rollup_specs(cfg)
+    chunk_rows = int(secret("WAREHOUSE_FETCH_ROWS", "50000"))
+    digest = fingerprint(dsn)
+    compiled = {k.id: compile_checks(k, cfg) for k in kpis}
+    by_fact: Dict[str, List[QualityCheck]] = {}
+    for checks in compiled.values():
+        for c in checks:
+            if c.check != "manual" and c not in by_fact.setdefault(c.fact, []):
+                by_fact[c.fact].append(c)
+
+    def ident(c: QualityCheck) -> Tuple[Any, ...]:
+        return c.fact, c.rule, c.check, tuple(c.columns), c.ref
+
+    results: Dict[Tuple[Any, ...], CheckResult] = {}
+    for fact, checks in by_fact.items():
+        spec = specs.get(fact)
+        # connections are only taken (behind the warehouse breaker) when the version or results must be computed
+        version = result_cache().get_or_load(
+            ("quality_version", "central", "central", "", json.dumps({"dsn": digest, "fact": fact})),
+            refresh_interval_s(spec.dataset) if spec else 300.0,
+            lambda: with_warehouse(dsn, lambda conn: _dataset_version(conn, fact, spec.date_column, spec.measures))
+            if spec else [time.time()])
+        # keyed by DSN, not department: departments sharing a warehouse share the results
+        key = ("quality", "central", "central", "", json.dumps(
+            {"dsn": digest, "fact": fact, "version": version, "checks": [c.__dict__ for c in checks]}, sort_keys=True))
+        fact_results = result_cache().get_or_load(
+            key, QUALITY_RESULT_TTL_S, lambda: with_warehouse(dsn, lambda conn: run_checks(conn, fact, checks, chunk_rows)))
+        results.update({ident(c): r for c, r in zip(checks, fact_results)})
+    return {kid: [results.get(ident(c)) or CheckResult(c.rule, "manual", "manual", detail="not automated")
+                  for c in checks]
+            for kid, checks in compiled.items()}
@@ -0,0 +1,188 @@
+"""Circuit breakers, latency-derived timeouts and jittered retries for the live source adapters.
+
+Each upstream endpoint (a DataHub GraphQL URL, a Power BI dataset, a warehouse DSN) gets a
+`Breaker`. It opens after SOURCE_BREAKER_FAILURES consecutive failures or calls slower than the
+source's latency budget, rejects calls for SOURCE_BREAKER_OPEN_S, then lets one probe through.
+While open, adapters fail fast and the result cache answers from the last good value. Timeouts
+follow the endpoint's observed p99 (x SOURCE_TIMEOUT_P99_FACTOR, between SOURCE_TIMEOUT_MIN_S and
+SOURCE_TIMEOUT_MAX_S); retryable failures are retried with full-jitter exponential backoff. Other
+failures are raised at once but still count towards opening the breaker.
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+import requests
+
+from .config import json_secret, secret, singleton
+from .metrics import metrics
+
+T = TypeVar("T")
+
+# Seconds above which a successful call still counts against the breaker, per source kind
+SOURCE_LATENCY_BUDGETS_S = {"datahub": 10.0, "powerbi_token": 10.0, "powerbi_dax": 15.0, "warehouse": 30.0}
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose breaker is open."""
+
+class RetryableError(RuntimeError):
+    """An upstream failure worth retrying (throttling, 5xx), optionally with the server's Retry-After."""
+
+    def __init__(self, message: str, retry_after_s: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+def http_error(source: str, r: "requests.Response") -> RuntimeError:
+    """The error to raise for a non-2xx response: 429 and 5xx are retryable."""
+    message = f"{source} failed: {r.status_code} {r.text[:500]}"
+    if r.status_code == 429 or r.status_code >= 500:
+        retry_after = r.headers.get("Retry-After", "")
+        return RetryableError(message, float(retry_after) if retry_after.isdigit() else None)
+    return RuntimeError(message)
+
+class Breaker:
+    """Closed → open after repeated failures or slow calls → half-open single probe → closed."""
+
+    def __init__(self, endpoint: str, kind: str, failure_threshold: int, open_s: float, budget_s: float,
+                 window: int = 200):
+        self.endpoint, self.kind = endpoint, kind
+        self.failure_threshold, self.open_s, self.budget_s = failure_threshold, open_s, budget_s
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "retries": 0, "opens": 0}
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        metrics().inc("circuit_transitions_total", endpoint=self.kind, state=state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= self.open_s:
+                self._transition("half_open")
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.stats["rejected"] += 1
+        metrics().inc("circuit_rejections_total", endpoint=self.kind)
+        return False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self.stats["calls"] += 1
+            if ok:
+                self._latencies.append(seconds)
+            slow = ok and seconds > self.budget_s
+            self.stats["slow"] += int(slow)
+            self.stats["failures"] += int(not ok)
+            probe, self._probing = self._probing, False
+            if ok and not slow:
+                self.failures = 0
+                if self.state != "closed":
+                    self._transition("closed")
+                return
+            self.failures += 1
+            if probe or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.stats["opens"] += 1
+                self._transition("open")
+                self.opened_at = time.time()
+
+    def note_retry(self) -> None:
+        with self._lock:
+            self.stats["retries"] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def timeout_s(self) -> float:
+        """Per-attempt timeout: the observed p99 times a safety factor, clamped; the max until there are samples."""
+        lo, hi = float(secret("SOURCE_TIMEOUT_MIN_S", "2")), float(secret("SOURCE_TIMEOUT_MAX_S", "30"))
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return hi
+        return min(hi, max(lo, p99 * float(secret("SOURCE_TIMEOUT_P99_FACTOR", "3"))))
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        with self._lock:
+            out = dict(self.stats, endpoint=self.endpoint, kind=self.kind, state=self.state,
+                       consecutive_failures=self.failures)
+        out.update(p50_s=p50, p99_s=p99, timeout_s=self.timeout_s())
+        return out
+
+class BreakerRegistry:
+    """One breaker per endpoint, created on first use with the current settings."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, Breaker] = {}
+
+    def get(self, kind: str, endpoint: str) -> Breaker:
+        key = f"{kind}:{endpoint}"
+        with self._lock:
+            b = self._breakers.get(key)
+            if b is None:
+                budgets = dict(SOURCE_LATENCY_BUDGETS_S, **(json_secret("SOURCE_LATENCY_BUDGETS_JSON", {}) or {}))
+                b = self._breakers[key] = Breaker(
+                    endpoint, kind,
+                    failure_threshold=int(secret("SOURCE_BREAKER_FAILURES", "5")),
+                    open_s=float(secret("SOURCE_BREAKER_OPEN_S", "30")),
+                    budget_s=float(budgets.get(kind, 30.0)),
+                )
+            return b
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [b.snapshot() for b in breakers]
+
+@singleton
+def breakers() -> BreakerRegistry:
+    return BreakerRegistry()
+
+def _retryable(e: Exception) -> bool:
+    return isinstance(e, (RetryableError, requests.Timeout, requests.ConnectionError)) or \
+        type(e).__name__ in ("OperationalError", "InterfaceError")  # DB-API connection-level failures
+
+def guarded_call(kind: str, endpoint: str, fn: Callable[[float], T], retries: Optional[int] = None) -> T:
+    """Call `fn(timeout_s)` behind `endpoint`'s breaker, retrying retryable failures with jittered backoff."""
+    breaker = breakers().get(kind, endpoint)
+    retries = int(secret("SOURCE_RETRIES", "2")) if retries is None else retries
+    base_s, cap_s = float(secret("SOURCE_RETRY_BASE_S", "0.5")), float(secret("SOURCE_RETRY_MAX_S", "8"))
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            wait_s = max(0.0, breaker.opened_at + breaker.open_s - time.time())
+            raise CircuitOpenError(f"{kind} circuit open after repeated failures; next probe in {wait_s:.0f}s")
+        t0 = time.perf_counter()
+        try:
+            result = fn(breaker.timeout_s())
+        except Exception as e:
+            if not _retryable(e):  # e.g. a 4xx or rejected credentials: not retried, but not a healthy call either
+                breaker.record(False, time.perf_counter() - t0)
+                raise
+            breaker.record(False, time.perf_counter() - t0)
+            if attempt >= retries:
+                raise
+            attempt += 1
+            breaker.note_retry()
+            metrics().inc("retries_total", endpoint=kind)
+            delay = random.uniform(0, min(cap_s, base_s * 2 ** attempt))  # full jitter
+            if isinstance(e, RetryableError) and e.retry_after_s:
+                delay = max(delay, min(cap_s, e.retry_after_s))
+            time.sleep(delay)
+            continue
+        breaker.record(True, time.perf_counter() - t0)
+        return result
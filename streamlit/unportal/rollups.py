@@ -0,0 +1,273 @@
+"""Incremental daily/monthly rollups of warehouse fact tables for constant-cost period queries."""
+import calendar
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import fingerprint, inline_refresh, json_secret, optional_import, secret, singleton
+from .freshness import refresh_interval_s
+
+@dataclass
+class RollupSpec:
+    fact: str
+    date_column: str
+    dimensions: List[str]
+    measures: List[str]
+    dataset: str
+
+# Daily/monthly rollups kept locally per fact table; override column names with ROLLUP_SPECS_JSON
+ROLLUP_SPECS: List[RollupSpec] = [
+    RollupSpec("fact_unfip_disbursements", "disbursement_date", ["funding_channel"],
+               ["disbursed_amount_usd"], "gold_unfip_funding"),
+    RollupSpec("fact_initiative_events", "event_date", ["initiative"],
+               ["in_person_attendees", "remote_viewers"], "gold_initiative_engagement"),
+    RollupSpec("fact_partnership_kpis", "kpi_date", ["kpi_id"],
+               ["achieved_value", "target_value"], "gold_partnership_kpis"),
+]
+
+def period_bounds(period: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Inclusive [start, end] dates for a period id (y2024, y2025, last_30d, last_6m)."""
+    today = today or date.today()
+    if period.startswith("y") and period[1:].isdigit():
+        year = int(period[1:])
+        return date(year, 1, 1), date(year, 12, 31)
+    if period == "last_30d":
+        return today - timedelta(days=29), today
+    if period == "last_6m":
+        month, year = today.month - 5, today.year
+        if month <= 0:
+            month, year = month + 12, year - 1
+        return date(year, month, 1), today
+    raise ValueError(f"Unknown period: {period}")
+
+class RollupStore:
+    """Local SQLite rollups of warehouse fact tables.
+
+    Each (fact, dimension values, measure) is a series with daily values, a running total
+    and monthly sums. A window total is two indexed lookups on the running total, so any
+    period costs the same no matter how long it is. `refresh()` re-aggregates only days at
+    or after the stored watermark (minus a restatement lookback).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._refresh_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS rollup_series (
+                    series_id INTEGER PRIMARY KEY, source TEXT, fact TEXT, dims TEXT, measure TEXT,
+                    UNIQUE (source, fact, dims, measure)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_daily (
+                    series_id INTEGER, day TEXT, value REAL, cum REAL, PRIMARY KEY (series_id, day)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_monthly (
+                    series_id INTEGER, month TEXT, value REAL, PRIMARY KEY (series_id, month)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_watermark (
+                    source TEXT, fact TEXT, day TEXT, refreshed_at REAL, PRIMARY KEY (source, fact)
+                );
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def watermark(self, source: str, fact: str) -> Tuple[Optional[str], float]:
+        with self._conn() as conn:
+            row = conn.execute("SELECT day, refreshed_at FROM rollup_watermark WHERE source=? AND fact=?",
+                               (source, fact)).fetchone()
+        return (row[0], row[1]) if row else (None, 0.0)
+
+    def refresh(self, wh_conn, source: str, spec: RollupSpec, lookback_days: int = 3, chunk_rows: int = 50000) -> int:
+        """Re-aggregate `spec.fact` from the watermark onward; returns the number of daily rows written."""
+        wm, _ = self.watermark(source, spec.fact)
+        since = (date.fromisoformat(wm) - timedelta(days=lookback_days)).isoformat() if wm else None
+        day_expr = f"date({spec.date_column})" if wh_conn.dialect.name == "sqlite" else f"CAST({spec.date_column} AS DATE)"
+        group = ", ".join([day_expr] + spec.dimensions)
+        select = ", ".join([f"{day_expr} AS day"] + spec.dimensions + [f"SUM({m}) AS {m}" for m in spec.measures])
+        sql = f"SELECT {select} FROM {spec.fact}" + (f" WHERE {spec.date_column} >= :since" if since else "") + f" GROUP BY {group}"
+
+        sa = optional_import("sqlalchemy")
+        result = wh_conn.execution_options(stream_results=True).execute(sa.text(sql), {"since": since} if since else {})
+        ndims = len(spec.dimensions)
+        points: List[Tuple[str, str, str, float]] = []
+        for part in result.partitions(chunk_rows):
+            for row in part:
+                day, dims = str(row[0])[:10], json.dumps([str(v) for v in row[1:1 + ndims]])
+                for i, m in enumerate(spec.measures):
+                    points.append((dims, m, day, float(row[1 + ndims + i] or 0)))
+
+        with self._lock, self._conn() as conn:
+            conn.executemany("INSERT OR IGNORE INTO rollup_series (source, fact, dims, measure) VALUES (?,?,?,?)",
+                             {(source, spec.fact, d, m) for d, m, _, _ in points})
+            ids = {(d, m): i for i, d, m in conn.execute(
+                "SELECT series_id, dims, measure FROM rollup_series WHERE source=? AND fact=?", (source, spec.fact))}
+            series = f"SELECT series_id FROM rollup_series WHERE source='{source}' AND fact='{spec.fact}'"
+            start = since or "0000-01-01"
+            conn.execute(f"DELETE FROM rollup_daily WHERE series_id IN ({series}) AND day >= ?", (start,))
+            conn.executemany("INSERT OR REPLACE INTO rollup_daily VALUES (?,?,?,NULL)",
+                             [(ids[(d, m)], day, v) for d, m, day, v in points])
+
+            # Running totals from `start`, continuing from each series' last total before it
+            daily = pd.read_sql_query(
+                f"SELECT series_id, day, value FROM rollup_daily WHERE series_id IN ({series}) AND day >= ? ORDER BY series_id, day",
+                conn, params=(start,))
+            if not daily.empty:
+                base = dict(conn.execute(
+                    f"SELECT d.series_id, d.cum FROM rollup_daily d JOIN (SELECT series_id, MAX(day) AS day FROM rollup_daily "
+                    f"WHERE series_id IN ({series}) AND day < ? GROUP BY series_id) p ON p.series_id=d.series_id AND p.day=d.day",
+                    (start,)).fetchall())
+                daily["cum"] = daily.groupby("series_id")["value"].cumsum() + daily["series_id"].map(base).fillna(0.0)
+                conn.executemany("UPDATE rollup_daily SET cum=? WHERE series_id=? AND day=?",
+                                 daily[["cum", "series_id", "day"]].itertuples(index=False, name=None))
+
+            month_start = start[:7]
+            conn.execute(f"DELETE FROM rollup_monthly WHERE series_id IN ({series}) AND month >= ?", (month_start,))
+            conn.execute(
+                f"INSERT INTO rollup_monthly SELECT series_id, substr(day, 1, 7), SUM(value) FROM rollup_daily "
+                f"WHERE series_id IN ({series}) AND day >= ? GROUP BY series_id, substr(day, 1, 7)",
+                (month_start + "-01",))
+
+            high = max([wm or ""] + [p[2] for p in points]) or None
+            conn.execute("INSERT OR REPLACE INTO rollup_watermark VALUES (?,?,?,?)", (source, spec.fact, high, time.time()))
+        return len(points)
+
+    def _pivot(self, rows: List[Tuple], spec: RollupSpec, extra: List[str]) -> pd.DataFrame:
+        cols = extra + spec.dimensions + spec.measures
+        if not rows:
+            return pd.DataFrame(columns=cols)
+        long = pd.DataFrame(rows, columns=["dims", "measure"] + extra + ["value"])
+        wide = long.pivot_table(index=extra + ["dims"], columns="measure", values="value", aggfunc="sum").reset_index()
+        dims = pd.DataFrame(wide["dims"].map(json.loads).tolist(), columns=spec.dimensions, index=wide.index)
+        out = pd.concat([wide.drop(columns="dims"), dims], axis=1)
+        for m in spec.measures:
+            if m not in out:
+                out[m] = 0.0
+        return out[cols].fillna(0.0)
+
+    @staticmethod
+    def _window_rows(conn: sqlite3.Connection, source: str, fact: str, start: date, end: date) -> List[Tuple]:
+        """(dims, measure, total over [start, end]) per series: two running-total lookups each."""
+        return conn.execute("""
+            SELECT s.dims, s.measure,
+              COALESCE((SELECT d.cum FROM rollup_daily d WHERE d.series_id=s.series_id AND d.day<=?
+                        ORDER BY d.day DESC LIMIT 1), 0)
+            - COALESCE((SELECT d.cum FROM rollup_daily d WHERE d.series_id=s.series_id AND d.day<?
+                        ORDER BY d.day DESC LIMIT 1), 0)
+            FROM rollup_series s WHERE s.source=? AND s.fact=?""",
+            (end.isoformat(), start.isoformat(), source, fact)).fetchall()
+
+    def window_totals(self, source: str, spec: RollupSpec, start: date, end: date) -> pd.DataFrame:
+        """Per-dimension measure totals over [start, end]."""
+        with self._conn() as conn:
+            rows = self._window_rows(conn, source, spec.fact, start, end)
+        return self._pivot(rows, spec, [])
+
+    def monthly(self, source: str, spec: RollupSpec, start: date, end: date) -> pd.DataFrame:
+        """Per-month, per-dimension measure totals within [start, end].
+
+        Whole months come from the monthly sums; a first or last month the window only partly
+        covers is totalled from the daily running totals, so no day outside the window counts.
+        """
+        first, last = start.isoformat()[:7], end.isoformat()[:7]
+        with self._conn() as conn:
+            rows = conn.execute("""
+                SELECT s.dims, s.measure, m.month, m.value FROM rollup_monthly m
+                JOIN rollup_series s ON s.series_id=m.series_id
+                WHERE s.source=? AND s.fact=? AND m.month BETWEEN ? AND ?""",
+                (source, spec.fact, first, last)).fetchall()
+            for month in {first, last}:
+                month_start = date(int(month[:4]), int(month[5:]), 1)
+                month_end = month_start.replace(day=calendar.monthrange(month_start.year, month_start.month)[1])
+                lo, hi = max(start, month_start), min(end, month_end)
+                if (lo, hi) != (month_start, month_end):
+                    rows = [r for r in rows if r[2] != month]
+                    rows += [(dims, measure, month, value)
+                             for dims, measure, value in self._window_rows(conn, source, spec.fact, lo, hi) if value]
+        return self._pivot(rows, spec, ["month"]).sort_values("month", ignore_index=True)
+
+    def refresh_lock(self, source: str, fact: str) -> threading.Lock:
+        with self._lock:
+            return self._refresh_locks.setdefault((source, fact), threading.Lock())
+
+@singleton
+def rollup_store() -> RollupStore:
+    return RollupStore(secret("ROLLUP_DB_PATH", ".cache/rollups.sqlite"))
+
+def rollups_enabled(cfg: Dict[str, Any]) -> bool:
+    return str(cfg.get("WAREHOUSE_ROLLUPS") or secret("WAREHOUSE_ROLLUPS", "")).lower() in ("1", "true", "yes")
+
+def rollup_specs(cfg: Dict[str, Any]) -> Dict[str, RollupSpec]:
+    raw = cfg.get("ROLLUP_SPECS") or json_secret("ROLLUP_SPECS_JSON", None)
+    specs = [RollupSpec(**s) for s in raw] if raw else ROLLUP_SPECS
+    return {s.fact: s for s in specs}
+
+def ensure_rollup(dsn: str, spec: RollupSpec) -> str:
+    """Rollup source key for `dsn`, refreshing it first if it was never built, in the background if due."""
+    source = fingerprint(dsn)
+    store = rollup_store()
+    wm, refreshed_at = store.watermark(source, spec.fact)
+    if time.time() - refreshed_at < refresh_interval_s(spec.dataset):
+        return source
+    lock = store.refresh_lock(source, spec.fact)
+
+    def run() -> None:
+        from .warehouse import with_warehouse  # warehouse imports this module
+
+        with_warehouse(dsn, lambda conn: store.refresh(conn, source, spec,
+                                                       lookback_days=int(secret("ROLLUP_LOOKBACK_DAYS", "3")),
+                                                       chunk_rows=int(secret("WAREHOUSE_FETCH_ROWS", "50000"))))
+
+    def run_in_background() -> None:
+        try:
+            run()
+        except Exception:
+            pass  # keep answering from the existing rollups; the next due check retries
+        finally:
+            lock.release()
+
+    if wm is None or inline_refresh.get():
+        with lock:  # nothing to answer from yet (or a batch job): build it, or wait for whoever is
+            if store.watermark(source, spec.fact)[0] is None or inline_refresh.get():
+                run()
+    elif lock.acquire(blocking=False):
+        threading.Thread(target=contextvars.copy_context().run, args=(run_in_background,), daemon=True,
+                         name="rollup-refresh").start()
+    return source
+
+def refresh_rollups(dsn: str, specs: Dict[str, RollupSpec]) -> List[str]:
+    """Build or refresh every configured rollup for `dsn`, including facts no chart reads yet (see prewarm)."""
+    return [ensure_rollup(dsn, spec) for spec in specs.values()]
+
+def rollup_chart_loaders(period: str, dsn: str, specs: Dict[str, RollupSpec]) -> Dict[str, Callable[[], pd.DataFrame]]:
+    """Dashboard frames answered from local rollups instead of rescanning the fact tables."""
+    start, end = period_bounds(period)
+    funding, events = specs["fact_unfip_disbursements"], specs["fact_initiative_events"]
+
+    def breakdown() -> pd.DataFrame:
+        df = rollup_store().window_totals(ensure_rollup(dsn, funding), funding, start, end)
+        return pd.DataFrame({"name": df[funding.dimensions[0]], "value": df[funding.measures[0]]})
+
+    def trend() -> pd.DataFrame:
+        df = rollup_store().monthly(ensure_rollup(dsn, funding), funding, start, end)
+        by_month = df.groupby("month", as_index=False)[funding.measures[0]].sum()
+        return pd.DataFrame({"x": by_month["month"], "disbursed_m": by_month[funding.measures[0]] / 1_000_000})
+
+    def reach() -> pd.DataFrame:
+        df = rollup_store().window_totals(ensure_rollup(dsn, events), events, start, end)
+        return pd.DataFrame({"initiative": df[events.dimensions[0]], "in_person": df[events.measures[0]],
+                             "remote": df[events.measures[1]]})
+
+    return {"breakdown": breakdown, "trend": trend, "reach": reach}
@@ -0,0 +1,151 @@
+"""In-memory BM25 catalog search with prefix matching and facets over a `ColumnarCatalog`."""
+import bisect
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .columnar import ColumnarCatalog, DatasetView
+from .config import singleton
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Field weights for catalog ranking (BM25F-style: weighted term frequencies, one length norm)
+SEARCH_FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "tables": 1.5, "domain": 1.5, "description": 1.0}
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+class CatalogIndex:
+    """Inverted index over catalog datasets with BM25 ranking, prefix matching and facets.
+
+    `sync()` is a no-op while the catalog's version is unchanged; otherwise it diffs the
+    rows against per-dataset signatures, so only added, changed or removed datasets touch
+    the postings. Facet filters come from the catalog's precomputed bitmaps.
+    """
+
+    PREFIX_DISCOUNT = 0.7  # a prefix hit ("fund" -> "funding") scores below an exact token
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self._lock = threading.Lock()
+        self._catalog = ColumnarCatalog.from_datasets([])
+        self._sigs: Dict[str, Tuple] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._total_len = 0.0
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocab: List[str] = []
+        self._vocab_dirty = False
+
+    @staticmethod
+    def _signature(d: DatasetView) -> Tuple:
+        return (d.name, d.domain, d.description, tuple(d.tags), tuple(d.tables), d.dept)
+
+    def _add(self, doc_id: str, d: DatasetView, sig: Tuple) -> None:
+        fields = {"name": d.name, "tags": " ".join(d.tags), "tables": " ".join(d.tables),
+                  "domain": d.domain, "description": d.description}
+        terms: Dict[str, float] = {}
+        length = 0.0
+        for field, text in fields.items():
+            weight = SEARCH_FIELD_WEIGHTS[field]
+            for tok in _tokenize(text or ""):
+                terms[tok] = terms.get(tok, 0.0) + weight
+                length += weight
+        for tok, wtf in terms.items():
+            if tok not in self._postings:
+                self._postings[tok] = {}
+                self._vocab_dirty = True
+            self._postings[tok][doc_id] = wtf
+        self._doc_terms[doc_id], self._doc_len[doc_id], self._sigs[doc_id] = terms, length, sig
+        self._total_len += length
+
+    def _remove(self, doc_id: str) -> None:
+        for tok in self._doc_terms.pop(doc_id):
+            posting = self._postings[tok]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[tok]
+                self._vocab_dirty = True
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._sigs.pop(doc_id)
+
+    def sync(self, catalog: ColumnarCatalog) -> int:
+        """Bring the index in line with `catalog`; returns how many datasets were (re)indexed or dropped."""
+        changed = 0
+        with self._lock:
+            if catalog is self._catalog or catalog.version == self._catalog.version:
+                self._catalog = catalog
+                return 0
+            for doc_id in [i for i in self._sigs if i not in catalog.row_of]:
+                self._remove(doc_id)
+                changed += 1
+            for d in catalog:
+                sig = self._signature(d)
+                if self._sigs.get(d.id) != sig:
+                    if d.id in self._sigs:
+                        self._remove(d.id)
+                    self._add(d.id, d, sig)
+                    changed += 1
+            self._catalog = catalog
+        return changed
+
+    def facet_values(self, facet: str, depts: Optional[Tuple[str, ...]] = None) -> List[str]:
+        """Values of a facet, limited to those present in `depts` when given."""
+        with self._lock:
+            catalog = self._catalog
+        return catalog.facet_values(facet, catalog.mask(depts=depts) if depts else None)
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        out = [(term, 1.0)] if term in self._postings else []
+        i = bisect.bisect_left(self._vocab, term)
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            if self._vocab[i] != term:
+                out.append((self._vocab[i], self.PREFIX_DISCOUNT))
+            i += 1
+        return out
+
+    def search(self, query: str, domain: Optional[str] = None, depts: Optional[Tuple[str, ...]] = None,
+               certified: Optional[bool] = None) -> Sequence[DatasetView]:
+        """Datasets matching every query term (exact or prefix), best match first."""
+        with self._lock:
+            catalog = self._catalog
+            filtered = bool(domain or depts or certified is not None)
+            allowed = catalog.mask(domain, depts, certified) if filtered else None
+            terms = _tokenize(query)
+            if not terms:
+                return catalog.rows(np.flatnonzero(allowed) if filtered else np.arange(len(catalog)))
+
+            n = len(catalog)
+            avg_len = (self._total_len / n) if n else 1.0
+            row_of = catalog.row_of
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores: Dict[str, float] = {}
+                for tok, boost in self._expand(term):
+                    posting = self._postings[tok]
+                    idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doc_id, wtf in posting.items():
+                        if allowed is not None and not allowed[row_of[doc_id]]:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                        s = boost * idf * wtf * (self.k1 + 1) / (wtf + norm)
+                        if s > term_scores.get(doc_id, 0.0):
+                            term_scores[doc_id] = s
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {i: scores[i] + s for i, s in term_scores.items() if i in scores}
+                if not scores:
+                    return catalog.rows([])
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], catalog.names[row_of[kv[0]]]))
+            return catalog.rows([row_of[i] for i, _ in ranked])
+
+@singleton
+def catalog_index(catalog_key: str) -> CatalogIndex:
+    return CatalogIndex()
@@ -0,0 +1,320 @@
+"""Warehouse adapter: pooled engines, streamed Parquet result cache and the dashboard chart loaders.
+
+SQLAlchemy and pyarrow are imported on first use.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import pandas as pd
+
+from .cache import result_cache, scoped_cache
+from .config import fingerprint, get_dept_config, json_secret, optional_import, secret, singleton
+from .freshness import refresh_interval_s
+from .metrics import metrics
+from .resilience import guarded_call
+from .rollups import period_bounds, rollup_chart_loaders, rollup_specs, rollups_enabled
+
+T = TypeVar("T")
+
+class EngineRegistry:
+    """Process-wide pooled SQLAlchemy engines, one per warehouse DSN.
+
+    Engines survive reruns and sessions so chart loads reuse warm connections. Pool
+    events feed the counters shown on the Integrations tab; engines whose DSN or pool
+    settings disappear from the config are disposed on the next `sync()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._config_sig: Optional[str] = None
+
+    def get(self, dsn: str, pool_size: int, max_overflow: int, pool_timeout: int):
+        settings = (pool_size, max_overflow, pool_timeout)
+        with self._lock:
+            cached = self._engines.get(dsn)
+            if cached and cached[0] == settings:
+                return cached[1]
+            stale = cached[1] if cached else None
+            sa = optional_import("sqlalchemy")
+            try:
+                eng = sa.create_engine(dsn, pool_pre_ping=True, pool_size=pool_size, max_overflow=max_overflow,
+                                       pool_timeout=pool_timeout, pool_recycle=1800)
+            except TypeError:
+                # Pools without overflow (e.g. SQLite in-memory) reject the sizing arguments
+                eng = sa.create_engine(dsn, pool_pre_ping=True)
+            self._instrument(dsn, eng)
+            self._engines[dsn] = (settings, eng)
+        if stale is not None:
+            stale.dispose()
+        return eng
+
+    def _instrument(self, dsn: str, eng) -> None:
+        stats = self._stats.setdefault(dsn, {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0,
+                                             "waits": 0, "wait_ms_total": 0.0, "overflow_peak": 0})
+
+        def on_connect(*_):
+            stats["connects"] += 1
+
+        def on_checkout(*_):
+            stats["checkouts"] += 1
+            overflow = getattr(eng.pool, "overflow", None)
+            if callable(overflow):
+                stats["overflow_peak"] = max(stats["overflow_peak"], overflow())
+
+        def on_checkin(*_):
+            stats["checkins"] += 1
+
+        def on_invalidate(*_):
+            stats["invalidations"] += 1
+
+        sa = optional_import("sqlalchemy")
+        sa.event.listen(eng, "connect", on_connect)
+        sa.event.listen(eng, "checkout", on_checkout)
+        sa.event.listen(eng, "checkin", on_checkin)
+        sa.event.listen(eng, "invalidate", on_invalidate)
+
+    def connect(self, dsn: str, pool_size: int, max_overflow: int, pool_timeout: int):
+        eng = self.get(dsn, pool_size, max_overflow, pool_timeout)
+        pool = eng.pool
+        # A checkout with every pooled connection busy has to overflow or queue for pool_timeout
+        busy = callable(getattr(pool, "checkedout", None)) and callable(getattr(pool, "size", None)) \
+            and pool.checkedout() >= pool.size()
+        t0 = time.perf_counter()
+        conn = eng.connect()
+        if busy:
+            stats = self._stats[dsn]
+            stats["waits"] += 1
+            stats["wait_ms_total"] += (time.perf_counter() - t0) * 1000
+        return conn
+
+    def sync(self, config_sig: str, dsns: List[str]) -> None:
+        """Dispose engines whose DSN is no longer configured. Cheap when the config is unchanged."""
+        with self._lock:
+            if config_sig == self._config_sig:
+                return
+            self._config_sig = config_sig
+            gone = [d for d in self._engines if d not in set(dsns)]
+            engines = [self._engines.pop(d)[1] for d in gone]
+            for d in gone:
+                self._stats.pop(d, None)
+        for eng in engines:
+            eng.dispose()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        rows = []
+        with self._lock:
+            items = list(self._engines.items())
+        for dsn, (settings, eng) in items:
+            pool = eng.pool
+            row = {"dsn": eng.url.render_as_string(hide_password=True), "pool_size": settings[0],
+                   "max_overflow": settings[1]}
+            for attr in ("checkedout", "checkedin", "overflow"):
+                fn = getattr(pool, attr, None)
+                row[attr] = fn() if callable(fn) else None
+            row.update(self._stats.get(dsn, {}))
+            rows.append(row)
+        return rows
+
+@singleton
+def engine_registry() -> EngineRegistry:
+    return EngineRegistry()
+
+def _configured_dsns() -> Tuple[str, List[str]]:
+    raw = secret("DEPARTMENT_CONFIG_JSON") or ""
+    cfg = json_secret("DEPARTMENT_CONFIG_JSON", {}) or {}
+    dsns = [secret("WAREHOUSE_DSN")] + [c.get("WAREHOUSE_DSN") for c in cfg.values() if isinstance(c, dict)]
+    dsns = sorted({d for d in dsns if d})
+    return f"{raw}|{'|'.join(dsns)}", dsns
+
+def warehouse_connect(dsn: str):
+    if optional_import("sqlalchemy") is None:
+        raise RuntimeError("Missing dependency: SQLAlchemy")
+    registry = engine_registry()
+    registry.sync(*_configured_dsns())
+    return registry.connect(
+        dsn,
+        pool_size=int(secret("WAREHOUSE_POOL_SIZE", "5")),
+        max_overflow=int(secret("WAREHOUSE_MAX_OVERFLOW", "10")),
+        pool_timeout=int(secret("WAREHOUSE_POOL_TIMEOUT", "30")),
+    )
+
+def with_warehouse(dsn: str, fn: Callable[[Any], T]) -> T:
+    """`fn(conn)` on a pooled connection, behind the warehouse breaker (see `guarded_call`)."""
+    def call(_timeout_s: float) -> T:  # statement timeouts are the warehouse's own setting
+        with warehouse_connect(dsn) as conn:
+            return fn(conn)
+    return guarded_call("warehouse", fingerprint(dsn), call)
+
+def _arrow_column(values: Sequence[Any]) -> Any:
+    """One chunk of a result column as an Arrow array; DECIMAL/NUMERIC values become float64.
+
+    Drivers return each NUMERIC as a `Decimal` of its own scale, so inferring `decimal128(p, s)`
+    per chunk would give chunks that cannot be cast to one another.
+    """
+    pa = optional_import("pyarrow")
+    if any(isinstance(v, Decimal) for v in values):
+        return pa.array([None if v is None else float(v) for v in values], type=pa.float64())
+    return pa.array(values)
+
+def _stream_to_parquet(conn, sql: str, params: Dict[str, Any], path: str, chunk_rows: int) -> int:
+    """Fetch `sql` through a server-side cursor in chunks and append each chunk to a Parquet file.
+
+    Chunks are converted column by column, so NULLs stay nulls of the column's type. The file
+    schema is the promotion of the chunks seen so far: when a later chunk needs a wider type
+    (an int column that turns out to hold 2.5, a column that was NULL so far), the rows written
+    until then are rewritten under the promoted schema. The file is written beside `path` and
+    swapped in atomically, so concurrent readers keep their memory map of the previous version.
+    """
+    sa, pa, pq = optional_import("sqlalchemy"), optional_import("pyarrow"), optional_import("pyarrow.parquet")
+    result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(sa.text(sql), params)
+    columns = list(result.keys())
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    writer, rows = None, 0
+    try:
+        for part in result.partitions(chunk_rows):
+            table = pa.Table.from_arrays([_arrow_column(col) for col in zip(*part)], names=columns)
+            rows += table.num_rows
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            schema = pa.unify_schemas([writer.schema, table.schema], promote_options="permissive")
+            if not schema.equals(writer.schema):
+                writer.close()
+                written = pq.read_table(tmp).cast(schema)
+                writer = pq.ParquetWriter(tmp, schema)
+                writer.write_table(written)
+            writer.write_table(table.cast(schema))
+        if writer is None:  # empty result: keep the column names
+            writer = pq.ParquetWriter(tmp, pa.schema([(c, pa.string()) for c in columns]))
+        writer.close()
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+_prune_lock = threading.Lock()
+_last_prune = 0.0
+
+def prune_parquet_cache(root: str, keep: str = "", max_age_s: Optional[float] = None,
+                        max_bytes: Optional[int] = None) -> int:
+    """Delete cached results older than `max_age_s`, then the oldest until the rest fit in `max_bytes`.
+
+    Readers whose file disappears re-run the query (see `_warehouse_frame`). Returns the number of files removed.
+    """
+    max_age_s = float(secret("WAREHOUSE_CACHE_MAX_AGE_S", "604800")) if max_age_s is None else max_age_s
+    max_bytes = int(float(secret("WAREHOUSE_CACHE_MAX_MB", "2048")) * 1024 * 1024) if max_bytes is None else max_bytes
+    now, files = time.time(), []
+    for entry in os.scandir(root):
+        if not entry.is_file():
+            continue
+        st = entry.stat()
+        orphan_tmp = entry.name.endswith(".tmp") and now - st.st_mtime > 86400  # left by a killed writer
+        if entry.name.endswith(".parquet") or orphan_tmp:
+            files.append((st.st_mtime, st.st_size, entry.path, orphan_tmp))
+    files.sort()
+    total, removed = sum(f[1] for f in files), 0
+    for mtime, size, path, orphan_tmp in files:
+        if path == keep or not (orphan_tmp or now - mtime > max_age_s or total > max_bytes):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    if removed:
+        metrics().inc("warehouse_cache_pruned_total", removed)
+    return removed
+
+def _maybe_prune(root: str, keep: str) -> None:
+    """Prune at most once per WAREHOUSE_CACHE_PRUNE_S per process."""
+    global _last_prune
+    now = time.time()
+    with _prune_lock:
+        if now - _last_prune < float(secret("WAREHOUSE_CACHE_PRUNE_S", "300")):
+            return
+        _last_prune = now
+    prune_parquet_cache(root, keep)
+
+@scoped_cache("warehouse", ttl=300, hashed=("dsn",))
+def warehouse_result(sql: str, params: Dict[str, Any], dsn: str, scope: str, dept: str, period: str = "",
+                     refresh_after_s: Optional[float] = None) -> Any:
+    """Run a warehouse query; returns the Parquet path of the cached result (or a DataFrame without pyarrow)."""
+    endpoint = fingerprint(dsn)
+    if optional_import("pyarrow.parquet") is None:
+        sa = optional_import("sqlalchemy")
+
+        def read(_timeout_s: float) -> pd.DataFrame:
+            with metrics().timed("warehouse_fetch"), warehouse_connect(dsn) as conn:
+                return pd.read_sql(sa.text(sql), conn, params=params)
+
+        df = guarded_call("warehouse", endpoint, read)
+        metrics().payload("warehouse_fetch", int(df.memory_usage(deep=True).sum()))
+        return df
+    root = secret("WAREHOUSE_CACHE_DIR", ".cache/warehouse")
+    os.makedirs(root, exist_ok=True)
+    digest = hashlib.sha256(json.dumps([sql, params, dsn], sort_keys=True, default=str).encode()).hexdigest()
+    path = os.path.join(root, f"{digest[:32]}.parquet")
+
+    def fetch(_timeout_s: float) -> None:  # statement timeouts are the warehouse's own setting
+        with metrics().timed("warehouse_fetch"), warehouse_connect(dsn) as conn:
+            _stream_to_parquet(conn, sql, params, path, int(secret("WAREHOUSE_FETCH_ROWS", "50000")))
+
+    guarded_call("warehouse", endpoint, fetch)
+    metrics().payload("warehouse_fetch", os.path.getsize(path))
+    _maybe_prune(root, path)
+    return path
+
+def warehouse_query(sql: str, params: Dict[str, Any], dsn: str, scope: str, dept: str, period: str = "",
+                    refresh_after_s: Optional[float] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Warehouse result as a DataFrame, reading only `columns` from the memory-mapped Parquet cache."""
+    with metrics().timed("warehouse_query"):
+        return _warehouse_frame(sql, params, dsn, scope, dept, period, refresh_after_s, columns)
+
+def _warehouse_frame(sql: str, params: Dict[str, Any], dsn: str, scope: str, dept: str, period: str,
+                     refresh_after_s: Optional[float], columns: Optional[List[str]]) -> pd.DataFrame:
+    res = warehouse_result(sql, params, dsn, scope, dept, period, refresh_after_s)
+    if isinstance(res, pd.DataFrame):
+        return res[columns] if columns else res
+    if not os.path.exists(res):  # cache dir wiped under a live index entry
+        result_cache().invalidate(source="warehouse", dept=dept)
+        res = warehouse_result(sql, params, dsn, scope, dept, period, refresh_after_s)
+    table = optional_import("pyarrow.parquet").read_table(res, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def warehouse_chart_loaders(period: str, scope: str, dept: str) -> Dict[str, Callable[[], pd.DataFrame]]:
+    cfg = get_dept_config(scope, dept)
+
+    dsn = cfg.get("WAREHOUSE_DSN") or secret("WAREHOUSE_DSN")
+    if not dsn:
+        raise RuntimeError("Missing WAREHOUSE_DSN.")
+    if rollups_enabled(cfg):
+        return rollup_chart_loaders(period, dsn, rollup_specs(cfg))
+
+    sql_breakdown = cfg.get("SQL_FUNDING_BREAKDOWN") or secret("SQL_FUNDING_BREAKDOWN", "")
+    sql_trend = cfg.get("SQL_UNFIP_TREND") or secret("SQL_UNFIP_TREND", "")
+    sql_reach = cfg.get("SQL_INITIATIVE_REACH") or secret("SQL_INITIATIVE_REACH", "")
+    if not (sql_breakdown and sql_trend and sql_reach):
+        raise RuntimeError("Missing SQL templates.")
+
+    start, end = period_bounds(period)
+    # Templates may use :year (calendar periods) or :start_date / :end_date (any period)
+    params = {"year": start.year if period.startswith("y") else end.year,
+              "start_date": start.isoformat(), "end_date": end.isoformat()}
+    funding_refresh = refresh_interval_s("gold_unfip_funding")
+    engagement_refresh = refresh_interval_s("gold_initiative_engagement")
+    return {
+        "breakdown": lambda: warehouse_query(sql_breakdown, params, dsn, scope, dept, period, funding_refresh,
+                                             columns=["name", "value"]),
+        "trend": lambda: warehouse_query(sql_trend, params, dsn, scope, dept, period, funding_refresh,
+                                         columns=["x", "disbursed_m"]),
+        "reach": lambda: warehouse_query(sql_reach, params, dsn, scope, dept, period, engagement_refresh,
+                                         columns=["initiative", "in_person", "remote"]),
+    }